@@ -1,15 +1,61 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Depends, Request
+from typing import Optional
+import os
+import uuid
 from celery.result import AsyncResult
 from celery_worker import celery_app
+from app.auth import verify_token
+from app.config import MAX_BATCH_FILES, MAX_BATCH_UPLOAD_BYTES
+from app.uploads import multipart_request_body, receive_upload_form
 
 router = APIRouter()
 
+UPLOAD_DIR = "uploads"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
 @router.post("/start-ai-task/")
-def start_task(user_id: str, land_id: str):
-    """Trigger a Celery background task"""
-    task = celery_app.send_task("process_event", args=[user_id, land_id])
+def start_task(user_id: str, land_id: str, zone_rows: Optional[int] = None, zone_cols: Optional[int] = None):
+    """Trigger a Celery background task, optionally splitting the field into zone_rows x zone_cols zones"""
+    zone_grid = [zone_rows or 1, zone_cols or 1] if zone_rows or zone_cols else None
+    if zone_grid and min(zone_grid) < 1:
+        raise HTTPException(status_code=400, detail="Zone rows and columns must be positive")
+    task = celery_app.send_task("process_event", args=[user_id, land_id, zone_grid])
     return {"task_id": task.id, "status": "Task Started"}
 
+@router.post(
+    "/start-batch-ai-task/{user_id}",
+    openapi_extra=multipart_request_body(
+        {"frames": {"type": "array", "items": {"type": "string", "format": "binary"}, "maxItems": MAX_BATCH_FILES}},
+        required=["frames"],
+    ),
+)
+async def start_batch_task(
+    user_id: str,
+    request: Request,
+    token_data: dict = Depends(verify_token),
+    workers: Optional[int] = None,
+    metrics_only: bool = False
+):
+    """Upload all frames of a flight, as multipart files named frames, and analyse them as one Celery job split over at most workers tasks"""
+    batch_dir = os.path.join(UPLOAD_DIR, f"{user_id}-{str(uuid.uuid4())}")
+    os.makedirs(batch_dir, exist_ok=True)
+
+    # Each frame is streamed to disk as the request arrives
+    _, files = await receive_upload_form(
+        request,
+        lambda field, filename: os.path.join(batch_dir, f"{str(uuid.uuid4())}-{filename}"),
+        max_files=MAX_BATCH_FILES,
+        max_total_bytes=MAX_BATCH_UPLOAD_BYTES
+    )
+    image_paths = [stored.path for stored in files if stored.field_name == "frames"]
+    if not image_paths:
+        for stored in files:
+            stored.discard()
+        raise HTTPException(status_code=400, detail="No frames uploaded")
+
+    task = celery_app.send_task("process_image_batch", args=[image_paths, workers, metrics_only])
+    return {"task_id": task.id, "status": "Task Started", "frame_count": len(image_paths)}
+
 @router.get("/track-ai-task/{task_id}")
 def get_task_status(task_id: str):
     """Check the status of a task"""
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 import json
 import os
 from app.auth import verify_token
+from app.uploads import multipart_request_body, receive_upload_form
 from app.services.farm_service import confirm_farm_area, get_latest_farm_area
 
 router = APIRouter()
@@ -10,28 +11,44 @@ UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 import uuid
 
-@router.post("/confirm-farm-area/{user_id}")
+@router.post(
+    "/confirm-farm-area/{user_id}",
+    openapi_extra=multipart_request_body(
+        {
+            "coords": {"type": "string", "description": 'JSON list of positions, e.g. [{"lat": 12.34, "lon": 56.78}]'},
+            "crop": {"type": "string"},
+            "snapshot": {"type": "string", "format": "binary"},
+        },
+        required=["coords", "crop", "snapshot"],
+    ),
+)
 async def post_confirm_farm_area(
     user_id: str,
+    request: Request,
     token_data: dict = Depends(verify_token),
-    coords: str = Form(...),
-    snapshot: UploadFile = File(...),
-    crop: str = Form(...) 
 ):
+    """Multipart form with the fields coords and crop and the file snapshot"""
+    # Stream the uploaded image file to disk as the request arrives, hashing it on the way.
+    fields, files = await receive_upload_form(
+        request,
+        lambda field, filename: os.path.join(UPLOAD_DIR, f"{str(uuid.uuid4())}-{filename}"),
+        max_files=1
+    )
+    snapshot = files[0] if files and files[0].field_name == "snapshot" else None
+    if snapshot is None or "coords" not in fields or "crop" not in fields:
+        for stored in files:
+            stored.discard()
+        raise HTTPException(status_code=422, detail="coords, crop and snapshot are required")
 
     try:
-        coords_list = json.loads(coords)  # e.g., [{"lat":12.34,"lon":56.78}, ...]
+        coords_list = json.loads(fields["coords"])  # e.g., [{"lat":12.34,"lon":56.78}, ...]
     except Exception as e:
+        snapshot.discard()
         raise HTTPException(status_code=400, detail="Invalid coordinates format") from e
 
-    # Save the uploaded image file.
-    file_location = os.path.join(UPLOAD_DIR, f"{str(uuid.uuid4())}-{snapshot.filename}")
-    with open(file_location, "wb") as f:
-        content = await snapshot.read()
-        f.write(content)
     # Call the service layer to insert the document, now including the crop.
     try:
-        inserted_id = await confirm_farm_area(user_id, coords_list, file_location, crop)
+        inserted_id = await confirm_farm_area(user_id, coords_list, snapshot.path, fields["crop"], snapshot.sha256)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to insert document") from e
 
@@ -0,0 +1,20 @@
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from imageProcess import render_full_overlay
+
+class LazyResultFiles(StaticFiles):
+    """Serves analysis results, rendering full-resolution overlays on first request"""
+
+    async def get_response(self, path: str, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+
+        # Not rendered yet: only the preview levels are written by the task
+        rendered = await run_in_threadpool(render_full_overlay, path)
+        if rendered is None:
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
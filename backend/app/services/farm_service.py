@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from app.db import lands_collection
 
-async def confirm_farm_area(user_id: str, coords: list, image_path: str, crop: str) -> str:
+async def confirm_farm_area(user_id: str, coords: list, image_path: str, crop: str, image_hash: str = None) -> str:
     now = datetime.utcnow()
     # Generate a unique landId using UUID4.
     land_id = str(uuid.uuid4())
@@ -12,6 +12,7 @@ async def confirm_farm_area(user_id: str, coords: list, image_path: str, crop: s
             "landId": land_id,
             "coordinates": coords,  # List of dicts: [{"lat": 12.34, "lon": 56.78}, ...]
             "image": image_path,
+            "imageHash": image_hash,  # SHA-256 of the image, reused by the analysis cache
             "crop": crop  # New field added inside the land object
         },
         "soil": {},
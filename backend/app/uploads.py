@@ -0,0 +1,238 @@
+import os
+import codecs
+import hashlib
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from app.config import MAX_UPLOAD_BYTES
+
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Largest accepted non-file form field, in bytes
+MAX_FIELD_BYTES = 1024 * 1024
+
+# Allowance per file for multipart boundaries and part headers when checking Content-Length
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+class StoredFile:
+    """
+    A file part of a multipart upload, written to disk as it arrives
+
+    Bytes are hashed and counted on the way through, under a .partial name
+    that is moved into place once the part is complete.
+    """
+
+    def __init__(self, field_name, filename, path):
+        self.field_name = field_name
+        self.filename = filename
+        self.path = path
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._partial = f"{path}.partial"
+        self._file = None
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def write(self, chunks):
+        if self._file is None:
+            self._file = open(self._partial, "wb")
+        for chunk in chunks:
+            self._digest.update(chunk)
+            self._file.write(chunk)
+
+    def finish(self):
+        self.write([])
+        self._file.close()
+        os.replace(self._partial, self.path)
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+        for path in (self._partial, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class _FormReceiver:
+    """python-multipart callbacks collecting form fields and queueing file data"""
+
+    def __init__(self, charset, destination_for, max_bytes, max_files, max_total_bytes):
+        self.charset = charset
+        self.destination_for = destination_for
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+        # Bytes of form data received so far, over all parts
+        self.total_bytes = 0
+        self.fields = {}
+        self.files = []
+        # File data received by the parser and not yet written, per part
+        self.pending = []
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._field_name = None
+        self._field_data = bytearray()
+        self._file = None
+
+    def _decode(self, value):
+        return value.decode(self.charset, errors="replace")
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._field_data = bytearray()
+        self._file = None
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail="Form part without a name")
+        self._field_name = self._decode(options[b"name"])
+
+        if b"filename" in options:
+            if self.max_files is not None and len(self.files) >= self.max_files:
+                raise HTTPException(status_code=400, detail=f"At most {self.max_files} files can be uploaded")
+            filename = os.path.basename(self._decode(options[b"filename"]))
+            self._file = StoredFile(self._field_name, filename, self.destination_for(self._field_name, filename))
+            self.files.append(self._file)
+
+    def on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        self.total_bytes += len(chunk)
+        if self.max_total_bytes is not None and self.total_bytes > self.max_total_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_total_bytes} bytes in total")
+        if self._file is None:
+            if len(self._field_data) + len(chunk) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field exceeds {MAX_FIELD_BYTES} bytes")
+            self._field_data.extend(chunk)
+            return
+
+        self._file.size += len(chunk)
+        if self._file.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_bytes} bytes")
+        if not self.pending or self.pending[-1][0] is not self._file:
+            self.pending.append((self._file, []))
+        self.pending[-1][1].append(chunk)
+
+    def on_part_end(self):
+        if self._file is None:
+            self.fields[self._field_name] = self._decode(bytes(self._field_data))
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+def _write_pending(pending):
+    for stored, chunks in pending:
+        stored.write(chunks)
+
+def _finish(files):
+    for stored in files:
+        stored.finish()
+
+def _discard(files):
+    for stored in files:
+        stored.discard()
+
+def multipart_request_body(properties, required):
+    """
+    openapi_extra documenting the multipart/form-data body of an endpoint that
+    reads it with receive_upload_form instead of Form and File parameters
+
+    Args:
+        properties: JSON schema of each form field; files are
+            {"type": "string", "format": "binary"}
+        required: Names of the fields that must be present
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {"type": "object", "properties": properties, "required": list(required)}
+                }
+            },
+        }
+    }
+
+async def receive_upload_form(request: Request, destination_for, max_bytes: int = MAX_UPLOAD_BYTES,
+                              max_files: int = None, max_total_bytes: int = None):
+    """
+    Stream a multipart form upload straight to disk
+
+    The request body is parsed as it arrives: each file part is written to
+    the path destination_for returns, in the threadpool so the event loop is
+    not blocked, and its SHA-256 and size are computed on the way through.
+    A request whose Content-Length already exceeds the limits is rejected
+    before any of it is read; otherwise reading stops as soon as a file
+    passes max_bytes or the form passes max_total_bytes. Files of a rejected
+    or broken upload are removed.
+
+    Args:
+        request: The multipart/form-data request
+        destination_for: Callable (field name, filename) -> path to write the file to
+        max_bytes: Size limit per file; larger uploads are rejected with a 413
+        max_files: Largest number of files accepted, or None for no limit
+        max_total_bytes: Size limit of the whole form, or None for no limit
+
+    Returns:
+        tuple: (fields, files), a dict of the text fields and the list of
+        StoredFile in upload order
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        overhead = FORM_OVERHEAD_BYTES * (max_files or 1)
+        if max_total_bytes is not None and int(content_length) > max_total_bytes + overhead:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_total_bytes} bytes in total")
+        if max_files is not None and int(content_length) > max_files * max_bytes + overhead:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "latin-1"
+    receiver = _FormReceiver(charset, destination_for, max_bytes, max_files, max_total_bytes)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.pending:
+                pending, receiver.pending = receiver.pending, []
+                await run_in_threadpool(_write_pending, pending)
+        parser.finalize()
+        await run_in_threadpool(_finish, receiver.files)
+    except BaseException as e:
+        await run_in_threadpool(_discard, receiver.files)
+        if isinstance(e, FormParserError):
+            raise HTTPException(status_code=400, detail="Malformed multipart upload") from e
+        raise
+
+    return receiver.fields, receiver.files
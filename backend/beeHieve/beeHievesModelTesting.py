@@ -11,6 +11,8 @@ import joblib
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import time
 import warnings
+from bee_features import SegmentFeatureExtractor
+from bee_audio_stream import iter_window_blocks
 warnings.filterwarnings('ignore')
 
 print("Starting bee sound model testing...")
@@ -21,113 +23,55 @@ MODEL_PATH = 'deep_bee_classifier.h5'  # Path to your trained DNN model
 SCALER_PATH = 'feature_scaler.pkl'  # Path to your feature scaler
 RESULTS_FOLDER = 'test_results'  # Folder to save results
 SEGMENT_LENGTH = 3  # Length of each segment in seconds
+PREDICT_BATCH_SIZE = 256  # Segments scaled and classified per model call
+FRAMEWISE_FEATURES = False  # Pool features from one pass over the recording instead of per segment
+SEGMENT_HOP = SEGMENT_LENGTH  # Seconds between segment starts in framewise mode; overlapping segments share frames when a multiple of 512 samples
+STREAM_AUDIO = False  # Decode recordings block by block instead of loading them whole, for multi-hour files
 
 # Create results folder
 os.makedirs(RESULTS_FOLDER, exist_ok=True)
 
-# First, let's examine the feature scaler to determine the expected number of features
-def get_expected_features():
-    """Get the expected number of features from the scaler"""
-    if os.path.exists(SCALER_PATH):
-        try:
-            scaler = joblib.load(SCALER_PATH)
-            # Get the expected feature count from the scaler's mean_ attribute
-            n_features = scaler.mean_.shape[0]
-            print(f"Model expects {n_features} features")
-            return n_features
-        except Exception as e:
-            print(f"Error examining scaler: {e}")
-            return None
+def classify_features(model, scaler, feature_matrix):
+    """
+    Scale and classify segment feature vectors in batches
+    
+    Args:
+        model: Trained Keras classifier
+        scaler: Fitted feature scaler
+        feature_matrix: Array of shape (n_segments, n_features)
+    
+    Returns:
+        tuple: (labels, probabilities) arrays with one entry per segment;
+        each probability is the confidence in its label
+    """
+    scaled_features = scaler.transform(feature_matrix)
+    
+    # One predict call per minibatch instead of per segment
+    batches = []
+    for start in range(0, len(scaled_features), PREDICT_BATCH_SIZE):
+        batch = scaled_features[start:start + PREDICT_BATCH_SIZE]
+        prediction = model.predict(batch, batch_size=len(batch), verbose=0)
+        if isinstance(prediction, list):
+            prediction = prediction[0]
+        batches.append(np.asarray(prediction).reshape(len(batch), -1))
+    prediction = np.concatenate(batches)
+    
+    if prediction.shape[1] > 1:
+        # Multi-class output
+        class_idx = np.argmax(prediction, axis=1)
+        probabilities = prediction[np.arange(len(prediction)), class_idx]
+        labels = np.where(class_idx == 1, 'bee', 'nobee')
     else:
-        print(f"Scaler not found at {SCALER_PATH}")
-        return None
-
-# Function to extract features consistently with training
-def extract_audio_features(audio, sr):
-    """Extract audio features to match the trained model expectations"""
-    try:
-        expected_features = get_expected_features()
-        
-        # 1. Spectral Centroid
-        spectral_centroids = librosa.feature.spectral_centroid(y=audio, sr=sr)[0]
-        
-        # 2. Spectral Rolloff
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)[0]
-        
-        # 3. MFCCs
-        mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-        
-        # 4. Zero Crossing Rate
-        zero_crossing_rate = librosa.feature.zero_crossing_rate(audio)[0]
-        
-        # 5. Spectral Contrast
-        spectral_contrast = librosa.feature.spectral_contrast(y=audio, sr=sr)
-        
-        # 6. Chroma Features
-        chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
-        
-        # Compute summary statistics
-        feature_vector = []
-        
-        # Add statistical features for each acoustic feature
-        for feature, name in [
-            (spectral_centroids, "spectral_centroid"),
-            (spectral_rolloff, "spectral_rolloff"),
-            (zero_crossing_rate, "zcr")
-        ]:
-            feature_vector.extend([
-                np.mean(feature),
-                np.std(feature),
-                np.min(feature),
-                np.max(feature)
-            ])
-        
-        # Add MFCC features
-        for i, mfcc in enumerate(mfccs):
-            feature_vector.extend([
-                np.mean(mfcc),
-                np.std(mfcc)
-            ])
-        
-        # Add spectral contrast
-        for i, contrast in enumerate(spectral_contrast):
-            feature_vector.extend([
-                np.mean(contrast),
-                np.std(contrast)
-            ])
-        
-        # Add chroma features
-        for i, chroma_band in enumerate(chroma):
-            feature_vector.extend([
-                np.mean(chroma_band),
-                np.std(chroma_band)
-            ])
-        
-        print(f"Extracted {len(feature_vector)} features")
-        
-        # Handle feature count mismatch
-        if expected_features is not None and len(feature_vector) != expected_features:
-            print(f"Feature count mismatch: extracted {len(feature_vector)}, expected {expected_features}")
-            
-            if len(feature_vector) < expected_features:
-                # Pad with zeros if we have too few features
-                padding = expected_features - len(feature_vector)
-                print(f"Padding with {padding} zeros")
-                feature_vector.extend([0] * padding)
-            else:
-                # Truncate if we have too many features
-                print(f"Truncating {len(feature_vector) - expected_features} features")
-                feature_vector = feature_vector[:expected_features]
-        
-        return feature_vector
-        
-    except Exception as e:
-        print(f"Error extracting features: {e}")
-        return None
+        # Binary output
+        bee_probability = prediction[:, 0]
+        labels = np.where(bee_probability > 0.5, 'bee', 'nobee')
+        probabilities = np.where(labels == 'bee', bee_probability, 1 - bee_probability)
+    
+    return labels, probabilities
 
 # Function to segment audio and get predictions
 def segment_and_predict(audio_path, model, scaler):
-    """Segment audio and predict on each segment"""
+    """Segment audio, extract features per segment and classify all segments in batches"""
     print(f"Processing {audio_path}...")
     
     try:
@@ -136,73 +80,63 @@ def segment_and_predict(audio_path, model, scaler):
         duration = len(y) / sr
         print(f"Audio duration: {duration:.2f} seconds, Sample rate: {sr} Hz")
         
+        # The extractor resolves the scaler's feature width once per recording
+        extractor = SegmentFeatureExtractor(sr, scaler=scaler)
+        
         # Create segments
         segments = []
-        segment_results = []
-        
-        # Calculate number of samples per segment
-        samples_per_segment = int(SEGMENT_LENGTH * sr)
+        feature_vectors = []
+        
+        if FRAMEWISE_FEATURES:
+            # Frame-level features are computed once and pooled per segment
+            starts, ends, features = extractor.extract_windows(y, SEGMENT_LENGTH, SEGMENT_HOP)
+            num_segments = len(starts)
+            print(f"Pooling {num_segments} segments of {SEGMENT_LENGTH} seconds every {SEGMENT_HOP} seconds")
+            segments = [(i, start / sr, end / sr) for i, (start, end) in enumerate(zip(starts, ends))]
+            feature_vectors = list(features)
+        else:
+            # Calculate number of samples per segment
+            samples_per_segment = int(SEGMENT_LENGTH * sr)
         
-        # Calculate number of segments
-        num_segments = int(np.ceil(len(y) / samples_per_segment))
-        print(f"Dividing into {num_segments} segments of {SEGMENT_LENGTH} seconds each")
+            # Calculate number of segments
+            num_segments = int(np.ceil(len(y) / samples_per_segment))
+            print(f"Dividing into {num_segments} segments of {SEGMENT_LENGTH} seconds each")
         
-        # Process each segment
-        for i in range(num_segments):
-            start_sample = i * samples_per_segment
-            end_sample = min((i + 1) * samples_per_segment, len(y))
-            
-            if end_sample - start_sample < 0.5 * samples_per_segment:  # Skip very short segments
-                continue
-                
-            segment = y[start_sample:end_sample]
-            start_time = start_sample / sr
-            end_time = end_sample / sr
+            # Extract features for each segment
+            for i in range(num_segments):
+                start_sample = i * samples_per_segment
+                end_sample = min((i + 1) * samples_per_segment, len(y))
             
-            try:
-                # Extract features
-                feature_vector = extract_audio_features(segment, sr)
-                
-                if feature_vector is None:
-                    print(f"Skipping segment {i+1} due to feature extraction error")
+                if end_sample - start_sample < 0.5 * samples_per_segment:  # Skip very short segments
                     continue
                 
-                # Scale features
-                scaled_features = scaler.transform(np.array(feature_vector).reshape(1, -1))
-                
-                # Make prediction
-                prediction = model.predict(scaled_features, verbose=0)
-                
-                # Process prediction based on its shape
-                if isinstance(prediction, list):
-                    prediction = prediction[0]
+                segment = y[start_sample:end_sample]
+            
+                try:
+                    feature_vector = extractor.extract(segment)
+                    segments.append((i, start_sample / sr, end_sample / sr))
+                    feature_vectors.append(feature_vector)
                 
-                if len(prediction.shape) > 1 and prediction.shape[1] > 1:
-                    # Multi-class output
-                    class_idx = np.argmax(prediction[0])
-                    probability = prediction[0][class_idx]
-                    label = 'bee' if class_idx == 1 else 'nobee'
-                else:
-                    # Binary output
-                    probability = prediction[0][0]
-                    label = 'bee' if probability > 0.5 else 'nobee'
-                    probability = probability if label == 'bee' else 1 - probability
+                    if (i+1) % 10 == 0:
+                        print(f"Extracted features for {i+1}/{num_segments} segments")
                 
-                # Store results
+                except Exception as e:
+                    print(f"Skipping segment {i+1} due to feature extraction error: {e}")
+        
+        # Scale and classify every segment together
+        segment_results = []
+        if feature_vectors:
+            labels, probabilities = classify_features(model, scaler, np.array(feature_vectors))
+            
+            for (i, start_time, end_time), label, probability in zip(segments, labels, probabilities):
                 segment_results.append({
                     'segment': i + 1,
                     'start_time': start_time,
                     'end_time': end_time,
                     'duration': end_time - start_time,
-                    'prediction': label,
+                    'prediction': str(label),
                     'probability': float(probability)
                 })
-                
-                if (i+1) % 10 == 0:
-                    print(f"Processed {i+1}/{num_segments} segments")
-                
-            except Exception as e:
-                print(f"Error processing segment {i+1}: {e}")
         
         print(f"Successfully processed {len(segment_results)}/{num_segments} segments")
         return segment_results, y, sr
@@ -211,6 +145,58 @@ def segment_and_predict(audio_path, model, scaler):
         print(f"Error processing audio file: {e}")
         return None, None, None
 
+def stream_and_predict(audio_path, model, scaler):
+    """
+    Decode, featurize and classify a recording block by block
+    
+    Memory stays flat regardless of recording length. Segments are the same
+    as in segment_and_predict.
+    
+    Yields:
+        list: Segment results of each block, in the format of segment_and_predict
+    """
+    print(f"Streaming {audio_path}...")
+    hop = SEGMENT_HOP if FRAMEWISE_FEATURES else SEGMENT_LENGTH
+    extractor = None
+    
+    for sr, block_start, block, starts, ends in iter_window_blocks(audio_path, SEGMENT_LENGTH, hop):
+        if extractor is None:
+            extractor = SegmentFeatureExtractor(sr, scaler=scaler)
+        hop_samples = int(hop * sr)
+        
+        if FRAMEWISE_FEATURES:
+            # Frame-level features are pooled within each block
+            segments = list(zip(starts, ends))
+            feature_vectors = list(extractor.pool_windows(block, starts, ends))
+        else:
+            segments, feature_vectors = [], []
+            for start, end in zip(starts, ends):
+                try:
+                    feature_vectors.append(extractor.extract(block[start:end]))
+                    segments.append((start, end))
+                except Exception as e:
+                    print(f"Skipping segment {(block_start + start) // hop_samples + 1} due to feature extraction error: {e}")
+        
+        if not feature_vectors:
+            continue
+        
+        labels, probabilities = classify_features(model, scaler, np.array(feature_vectors))
+        block_results = []
+        for (start, end), label, probability in zip(segments, labels, probabilities):
+            start_time = (block_start + start) / sr
+            end_time = (block_start + end) / sr
+            block_results.append({
+                'segment': int((block_start + start) // hop_samples) + 1,
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration': end_time - start_time,
+                'prediction': str(label),
+                'probability': float(probability)
+            })
+        
+        print(f"Classified segments up to {block_results[-1]['end_time']:.0f} seconds")
+        yield block_results
+
 # Function to analyze results
 def analyze_results(results, audio_path, y, sr):
     """Analyze prediction results and generate insights"""
@@ -232,25 +218,28 @@ def analyze_results(results, audio_path, y, sr):
     high_conf_bee = sum(1 for r in results if r['prediction'] == 'bee' and r['probability'] >= high_conf_threshold)
     high_conf_nobee = sum(1 for r in results if r['prediction'] == 'nobee' and r['probability'] >= high_conf_threshold)
     
-    # Identify sequences of consistent predictions
+    # Identify sequences of consistent predictions. A sequence spans from the
+    # start of its first segment to the end of its last, which also holds
+    # when segments overlap (SEGMENT_HOP < SEGMENT_LENGTH)
     current_label = None
     current_sequence = 0
     max_sequence = 0
     max_sequence_label = None
     sequences = []
     
-    for r in results:
+    for previous, r in zip([None] + results[:-1], results):
         if current_label is None:
             current_label = r['prediction']
             current_sequence = 1
+            sequence_start = r['start_time']
         elif r['prediction'] == current_label:
             current_sequence += 1
         else:
             sequences.append({
                 'label': current_label,
                 'length': current_sequence,
-                'start': r['start_time'] - (current_sequence * (r['duration'])),
-                'end': r['start_time']
+                'start': sequence_start,
+                'end': previous['end_time']
             })
             
             if current_sequence > max_sequence:
@@ -259,13 +248,14 @@ def analyze_results(results, audio_path, y, sr):
                 
             current_label = r['prediction']
             current_sequence = 1
+            sequence_start = r['start_time']
     
     # Add the last sequence
     if current_label is not None:
         sequences.append({
             'label': current_label,
             'length': current_sequence,
-            'start': results[-1]['end_time'] - (current_sequence * results[-1]['duration']),
+            'start': sequence_start,
             'end': results[-1]['end_time']
         })
         
@@ -297,10 +287,13 @@ def analyze_results(results, audio_path, y, sr):
     # Create waveform plot with predictions
     plt.figure(figsize=(15, 10))
     
-    # Plot 1: Waveform
+    # Plot 1: Waveform (streamed recordings are never held in memory)
     plt.subplot(3, 1, 1)
-    librosa.display.waveshow(y, sr=sr)
-    plt.title(f"Waveform - {filename_base}")
+    if y is not None:
+        librosa.display.waveshow(y, sr=sr)
+        plt.title(f"Waveform - {filename_base}")
+    else:
+        plt.title(f"Waveform - {filename_base} (not available for streamed recordings)")
     plt.xlabel("Time (s)")
     plt.ylabel("Amplitude")
     
@@ -334,29 +327,30 @@ def analyze_results(results, audio_path, y, sr):
     plt.savefig(os.path.join(RESULTS_FOLDER, f"{filename_base}_analysis.png"))
     
     # Create a spectrogram with predictions
-    plt.figure(figsize=(15, 8))
+    if y is not None:
+        plt.figure(figsize=(15, 8))
+    
+        # Plot spectrogram
+        D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
+        plt.subplot(2, 1, 1)
+        librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log')
+        plt.colorbar(format='%+2.0f dB')
+        plt.title(f"Spectrogram - {filename_base}")
+    
+        # Plot predictions below
+        plt.subplot(2, 1, 2)
+        for r in results:
+            color = 'green' if r['prediction'] == 'bee' else 'red'
+            alpha = min(1.0, r['probability'])
+            plt.axvspan(r['start_time'], r['end_time'], alpha=alpha, color=color)
+    
+        plt.yticks([])
+        plt.xlim(0, results[-1]['end_time'] if results else 0)
+        plt.title("Predictions (Green = Bee, Red = NoBee)")
+        plt.xlabel("Time (s)")
     
-    # Plot spectrogram
-    D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
-    plt.subplot(2, 1, 1)
-    librosa.display.specshow(D, sr=sr, x_axis='time', y_axis='log')
-    plt.colorbar(format='%+2.0f dB')
-    plt.title(f"Spectrogram - {filename_base}")
-    
-    # Plot predictions below
-    plt.subplot(2, 1, 2)
-    for r in results:
-        color = 'green' if r['prediction'] == 'bee' else 'red'
-        alpha = min(1.0, r['probability'])
-        plt.axvspan(r['start_time'], r['end_time'], alpha=alpha, color=color)
-    
-    plt.yticks([])
-    plt.xlim(0, results[-1]['end_time'] if results else 0)
-    plt.title("Predictions (Green = Bee, Red = NoBee)")
-    plt.xlabel("Time (s)")
-    
-    plt.tight_layout()
-    plt.savefig(os.path.join(RESULTS_FOLDER, f"{filename_base}_spectrogram.png"))
+        plt.tight_layout()
+        plt.savefig(os.path.join(RESULTS_FOLDER, f"{filename_base}_spectrogram.png"))
     
     # Save segment results to CSV
     results_df = pd.DataFrame(results)
@@ -470,7 +464,17 @@ def main():
         
         # Process audio
         start_time = time.time()
-        results, audio, sr = segment_and_predict(audio_path, model, scaler)
+        if STREAM_AUDIO:
+            results, audio, sr = [], None, None
+            try:
+                for block_results in stream_and_predict(audio_path, model, scaler):
+                    results.extend(block_results)
+            except Exception as e:
+                # e.g. a format soundfile cannot decode; skip the file like segment_and_predict
+                print(f"Error processing audio file: {e}")
+                results = None
+        else:
+            results, audio, sr = segment_and_predict(audio_path, model, scaler)
         processing_time = time.time() - start_time
         
         if not results or len(results) == 0:
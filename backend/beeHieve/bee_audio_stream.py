@@ -0,0 +1,68 @@
+"""
+Block-wise reading of long hive recordings
+
+librosa.load decodes a whole file into memory, which does not scale to
+continuous monitoring recordings many hours long. iter_window_blocks decodes
+a file with soundfile in blocks of windows_per_block analysis windows, so
+memory stays flat regardless of recording length.
+
+Consecutive blocks overlap by (window - hop) samples, so every window lies
+entirely inside the block that yields it. Windows are the same as slicing the
+fully loaded signal: one starts every hop samples, the last ones are cut
+short by the end of the file, and those shorter than half a window are
+skipped. Samples are mixed down to mono float32 the way librosa.load does.
+"""
+import numpy as np
+import soundfile as sf
+
+# Analysis windows decoded per block; 128 windows of 3 s at 22.05 kHz is ~34 MB
+STREAM_BLOCK_WINDOWS = 128
+
+
+def _with_last_flag(iterable):
+    """Yield (item, is_last) pairs"""
+    iterator = iter(iterable)
+    try:
+        current = next(iterator)
+    except StopIteration:
+        return
+    for following in iterator:
+        yield current, False
+        current = following
+    yield current, True
+
+
+def iter_window_blocks(audio_path, window_seconds, hop_seconds=None, windows_per_block=STREAM_BLOCK_WINDOWS):
+    """
+    Decode a recording block by block, with the analysis windows of each block
+
+    Args:
+        audio_path: Path to a file soundfile can read (WAV, FLAC, OGG, MP3)
+        window_seconds: Analysis window length
+        hop_seconds: Distance between window starts, window_seconds by default
+        windows_per_block: Windows starting in each block
+
+    Yields:
+        tuple: (sr, block_start, block, starts, ends), where block is mono
+        float32 audio beginning at sample block_start of the recording and
+        starts/ends are the bounds of its windows relative to the block
+    """
+    sr = sf.info(audio_path).samplerate
+    window = int(window_seconds * sr)
+    hop = int((hop_seconds or window_seconds) * sr)
+    overlap = max(window - hop, 0)
+    # Block j then starts at sample j * windows_per_block * hop
+    blocksize = windows_per_block * hop + overlap
+
+    blocks = sf.blocks(audio_path, blocksize=blocksize, overlap=overlap, dtype='float32', always_2d=True)
+    for index, (block, is_last) in enumerate(_with_last_flag(blocks)):
+        block = block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+
+        # Only the final block holds windows beyond windows_per_block, cut
+        # short by the end of the file
+        n_windows = -(-len(block) // hop) if is_last else windows_per_block
+        starts = np.arange(n_windows) * hop
+        ends = np.minimum(starts + window, len(block))
+        keep = ends - starts >= 0.5 * window
+
+        yield sr, index * windows_per_block * hop, block, starts[keep], ends[keep]
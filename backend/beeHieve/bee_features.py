@@ -0,0 +1,331 @@
+"""
+Segment feature extraction for the bee sound classifier
+
+Produces the 76 summary statistics of the training layout
+(bee_sound_features.csv):
+
+    spectral centroid, spectral rolloff, zero crossing rate   mean/std/min/max  (12)
+    13 MFCCs                                                  mean/std          (26)
+    7 spectral contrast bands                                 mean/std          (14)
+    12 chroma bins                                            mean/std          (24)
+
+All spectral features are derived from one magnitude STFT per segment
+(n_fft=2048, hop 512, librosa's defaults) instead of each librosa feature
+computing its own, and the statistics are reduced over stacked feature
+matrices in one pass. Results match calling the librosa features on the
+raw signal.
+
+extract_windows computes the features of every window from one pass over a
+recording, in chunks of frames. A frame's spectrum, spectral statistics, mel
+energies and pitch peaks are computed once and shared by every window that
+fully contains it, so overlapping windows (e.g. 3 s every 0.5 s) cost little
+more than non-overlapping ones when the hop is a multiple of HOP_LENGTH;
+windows that share no frame are extracted on their own. Frames that reach
+past a window's edges are recomputed from the padded window, and chroma
+tuning and the MFCC dB floor are estimated per window, so the vectors match
+extract() on each window up to float rounding. A chunk keeps about 5 KB per
+frame, mostly the power spectrum chroma is computed from.
+
+The fitted scaler may expect a different width (the shipped one expects 77);
+vectors are zero-padded or truncated to match it.
+"""
+from collections import namedtuple
+
+import numpy as np
+import joblib
+import librosa
+
+# Width of the feature layout produced by extraction
+N_BASE_FEATURES = 76
+
+# STFT parameters shared by every spectral feature (librosa's defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+
+# Frames per block when computing frame features over a whole recording;
+# small enough for the block's spectra to stay in cache
+FRAME_BLOCK = 256
+
+# Longest stretch of audio, in frames, whose frame features pool_windows
+# keeps at once
+POOL_CHUNK_FRAMES = 8 * FRAME_BLOCK
+
+# Frame-level features of a set of frames. Columns of stats4 (centroid,
+# rolloff, zero crossing rate), contrast, mel and power are frames; pitches
+# and pitch_mags are the piptrack peaks of the power spectrum, with the
+# column of each in pitch_frames.
+_Frames = namedtuple("_Frames", "stats4 contrast mel power pitches pitch_mags pitch_frames")
+
+
+def _window_bounds(n_samples, window_samples, hop_samples):
+    """Return (starts, ends) sample bounds of the windows, skipping tails shorter than half a window"""
+    starts = np.arange(0, n_samples, hop_samples)
+    ends = np.minimum(starts + window_samples, n_samples)
+    keep = ends - starts >= 0.5 * window_samples
+    return starts[keep], ends[keep]
+
+
+def _window_chunks(starts, ends, max_span):
+    """Split window indices into runs of consecutive windows spanning at most max_span samples"""
+    chunk, lo, hi = [], 0, 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if chunk and max(hi, end) - min(lo, start) > max_span:
+            yield chunk
+            chunk = []
+        if not chunk:
+            lo, hi = start, end
+        lo, hi = min(lo, start), max(hi, end)
+        chunk.append(i)
+    if chunk:
+        yield chunk
+
+
+def _concat_frames(parts):
+    """Join _Frames along the frame axis"""
+    offsets = np.cumsum([0] + [part.stats4.shape[1] for part in parts[:-1]])
+    return _Frames(
+        *(np.hstack([getattr(part, field) for part in parts]) for field in ("stats4", "contrast", "mel", "power")),
+        np.concatenate([part.pitches for part in parts]),
+        np.concatenate([part.pitch_mags for part in parts]),
+        np.concatenate([part.pitch_frames + offset for part, offset in zip(parts, offsets)]),
+    )
+
+
+def _take_frames(frames, idx):
+    """Select the frames at the (distinct) column indices idx, in that order"""
+    position = np.full(frames.stats4.shape[1], -1)
+    position[idx] = np.arange(len(idx))
+    columns = position[frames.pitch_frames]
+    keep = columns >= 0
+    return _Frames(
+        frames.stats4[:, idx], frames.contrast[:, idx], frames.mel[:, idx], frames.power[:, idx],
+        frames.pitches[keep], frames.pitch_mags[keep], columns[keep],
+    )
+
+
+class SegmentFeatureExtractor:
+    """
+    Extracts feature vectors from audio segments of one sample rate
+
+    The expected width is resolved once from the scaler, so extract() does no
+    disk access, logging or width checks.
+
+    Args:
+        sr: Sample rate of the segments
+        scaler: Fitted feature scaler; its mean_ gives the expected width
+        n_features: Expected width, if there is no scaler
+    """
+
+    def __init__(self, sr, scaler=None, n_features=None):
+        self.sr = sr
+        self.scaler = scaler
+        if n_features is None:
+            n_features = scaler.mean_.shape[0] if scaler is not None else N_BASE_FEATURES
+        self.n_features = n_features
+        # Features copied into each vector; the rest stay zero
+        self._n_copied = min(n_features, N_BASE_FEATURES)
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        # Chroma filter banks by tuning, for pool_windows
+        self._chroma_bases = {}
+
+    @classmethod
+    def from_scaler_path(cls, sr, scaler_path):
+        """Create an extractor for the scaler saved at scaler_path"""
+        return cls(sr, scaler=joblib.load(scaler_path))
+
+    def extract(self, segment):
+        """
+        Return the feature vector of one segment
+
+        Args:
+            segment: 1-D float audio samples
+
+        Returns:
+            np.ndarray: float64 vector of length n_features
+        """
+        features = self.summarize(*self.frame_features(segment))
+        
+        vector = np.zeros(self.n_features)
+        vector[:self._n_copied] = features[:self._n_copied]
+        return vector
+
+    def frame_features(self, audio):
+        """
+        Compute the frame-level features of a signal from a single STFT
+
+        Returns:
+            tuple: (stats4, stats2) float32 arrays of shape (3, n_frames) and
+            (32, n_frames). stats4 rows are spectral centroid, rolloff and
+            zero crossing rate; stats2 rows are the MFCCs, spectral contrast
+            bands and chroma bins.
+        """
+        magnitude = np.abs(librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH))
+        zero_crossing_rate = librosa.feature.zero_crossing_rate(audio, frame_length=N_FFT, hop_length=HOP_LENGTH)
+        return self._stack_features(magnitude, zero_crossing_rate)
+
+    def _frame_table(self, spectral, temporal, offsets):
+        """
+        Compute the features of the frames starting at the given offsets
+
+        Args:
+            spectral, temporal: The signal padded as the STFT (zeros) and the
+                zero crossing rate (edge values) pad it
+            offsets: Distinct start samples of the frames; each run of
+                frames HOP_LENGTH apart takes one STFT per FRAME_BLOCK
+
+        Returns:
+            _Frames: One column per offset, in the order of offsets
+        """
+        sr = self.sr
+        # Runs are frames on the same hop grid, so group offsets by grid first
+        order = np.lexsort((offsets, offsets % HOP_LENGTH))
+        grouped = offsets[order]
+        runs = np.split(grouped, np.flatnonzero(np.diff(grouped) != HOP_LENGTH) + 1)
+        parts = []
+        for run in runs:
+            for f0 in range(0, len(run), FRAME_BLOCK):
+                lo, hi = run[f0], run[min(f0 + FRAME_BLOCK, len(run)) - 1] + N_FFT
+                magnitude = np.abs(librosa.stft(spectral[lo:hi], n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+                power = magnitude ** 2
+                zero_crossing_rate = librosa.feature.zero_crossing_rate(
+                    temporal[lo:hi], frame_length=N_FFT, hop_length=HOP_LENGTH, center=False
+                )
+                # The peaks chroma_stft's tuning estimate is taken from
+                pitch, pitch_mag = librosa.piptrack(S=power, sr=sr)
+                bins, columns = np.nonzero(pitch > 0)
+                parts.append(_Frames(
+                    np.vstack((
+                        librosa.feature.spectral_centroid(S=magnitude, sr=sr, n_fft=N_FFT),
+                        librosa.feature.spectral_rolloff(S=magnitude, sr=sr, n_fft=N_FFT),
+                        zero_crossing_rate,
+                    )),
+                    librosa.feature.spectral_contrast(S=magnitude, sr=sr, n_fft=N_FFT),
+                    np.einsum("ft,mf->mt", power, self._mel_basis, optimize=True),
+                    power,
+                    pitch[bins, columns],
+                    pitch_mag[bins, columns],
+                    columns,
+                ))
+        return _take_frames(_concat_frames(parts), np.argsort(order))
+
+    def _summarize_frames(self, frames):
+        """summarize() the frames of one window, with the window's chroma tuning and dB floor"""
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(frames.mel), n_mfcc=N_MFCC)
+
+        # librosa.estimate_tuning: peaks at or above the median peak magnitude
+        threshold = np.median(frames.pitch_mags) if len(frames.pitch_mags) else 0.0
+        tuning = librosa.pitch_tuning(frames.pitches[frames.pitch_mags >= threshold], bins_per_octave=12)
+        chroma_basis = self._chroma_bases.get(tuning)
+        if chroma_basis is None:
+            chroma_basis = self._chroma_bases[tuning] = librosa.filters.chroma(sr=self.sr, n_fft=N_FFT, tuning=tuning)
+        chroma = librosa.util.normalize(
+            np.einsum("cf,ft->ct", chroma_basis, frames.power, optimize=True), norm=np.inf, axis=-2
+        )
+
+        return self.summarize(frames.stats4, np.vstack((mfccs, frames.contrast, chroma)))
+
+    def _stack_features(self, magnitude, zero_crossing_rate):
+        sr = self.sr
+        power = magnitude ** 2
+
+        spectral_centroids = librosa.feature.spectral_centroid(S=magnitude, sr=sr, n_fft=N_FFT)
+        spectral_rolloff = librosa.feature.spectral_rolloff(S=magnitude, sr=sr, n_fft=N_FFT)
+
+        mel = np.einsum("ft,mf->mt", power, self._mel_basis, optimize=True)
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+        spectral_contrast = librosa.feature.spectral_contrast(S=magnitude, sr=sr, n_fft=N_FFT)
+        chroma = librosa.feature.chroma_stft(S=power, sr=sr, n_fft=N_FFT)
+
+        stats4 = np.vstack((spectral_centroids, spectral_rolloff, zero_crossing_rate))
+        stats2 = np.vstack((mfccs, spectral_contrast, chroma))
+        return stats4, stats2
+
+    def extract_windows(self, audio, window_seconds, hop_seconds=None):
+        """
+        Return feature vectors of sliding windows from one pass over a recording
+
+        Args:
+            audio: 1-D float audio samples of the whole recording
+            window_seconds: Window length
+            hop_seconds: Distance between window starts, window_seconds by default
+
+        Returns:
+            tuple: (starts, ends, features), sample bounds of each window and
+            an (n_windows, n_features) matrix
+        """
+        window_samples = int(window_seconds * self.sr)
+        hop_samples = int((hop_seconds or window_seconds) * self.sr)
+        starts, ends = _window_bounds(len(audio), window_samples, hop_samples)
+        return starts, ends, self.pool_windows(audio, starts, ends)
+
+    def pool_windows(self, audio, starts, ends):
+        """
+        Return feature vectors of the given windows from one pass over audio
+
+        Each vector matches extract(audio[start:end]) up to float rounding.
+
+        Args:
+            audio: 1-D float audio samples
+            starts, ends: Integer arrays of window sample bounds within audio
+
+        Returns:
+            np.ndarray: (n_windows, n_features) matrix
+        """
+        starts, ends = np.asarray(starts), np.asarray(ends)
+        vectors = np.zeros((len(starts), self.n_features))
+
+        half = N_FFT // 2
+        # librosa pads the STFT with zeros and the zero crossing rate with edge values
+        spectral = np.pad(audio, half)
+        temporal = np.pad(audio, half, mode="edge")
+
+        for chunk in _window_chunks(starts, ends, POOL_CHUNK_FRAMES * HOP_LENGTH):
+            # Frame k of a window is centred on sample start + k * HOP_LENGTH.
+            # It is shared with the recording's frame on that centre unless it
+            # reaches past a window edge that is not also the recording's edge.
+            layouts = []
+            for i in chunk:
+                start, end = starts[i], ends[i]
+                first = np.arange(1 + (end - start) // HOP_LENGTH) * HOP_LENGTH - half
+                shared = (first >= 0) | (start == 0)
+                shared &= (first + N_FFT <= end - start) | (end == len(audio))
+                layouts.append((start, end, first, shared))
+
+            # The recording frame centred on sample c starts at c in the padded signal
+            window_centres = [start + first[shared] + half for start, _, first, shared in layouts]
+            centres, uses = np.unique(np.concatenate(window_centres), return_counts=True)
+            # Windows sharing no frame with another (no overlap, or a hop off
+            # the frame grid) gain nothing from the table
+            pooled = [uses[np.searchsorted(centres, c)].max(initial=0) > 1 for c in window_centres]
+            if any(pooled):
+                centres = np.unique(np.concatenate([c for c, is_pooled in zip(window_centres, pooled) if is_pooled]))
+                recording = self._frame_table(spectral, temporal, centres)
+
+            for i, (start, end, first, shared), window_centre, is_pooled in zip(chunk, layouts, window_centres, pooled):
+                if not is_pooled:
+                    vectors[i] = self.extract(audio[start:end])
+                    continue
+                window = _take_frames(recording, np.searchsorted(centres, window_centre))
+                if not shared.all():
+                    segment = audio[start:end]
+                    edges = self._frame_table(
+                        np.pad(segment, half), np.pad(segment, half, mode="edge"), first[~shared] + half
+                    )
+                    order = np.argsort(np.concatenate((np.flatnonzero(shared), np.flatnonzero(~shared))))
+                    window = _take_frames(_concat_frames([window, edges]), order)
+                vectors[i, :self._n_copied] = self._summarize_frames(window)[:self._n_copied]
+        return vectors
+
+    @staticmethod
+    def summarize(stats4, stats2):
+        """
+        Reduce frame-level features to the training layout
+
+        Returns:
+            np.ndarray: The N_BASE_FEATURES summary statistics, interleaved per
+            feature as mean, std[, min, max]
+        """
+        summary4 = np.column_stack((stats4.mean(axis=1), stats4.std(axis=1), stats4.min(axis=1), stats4.max(axis=1)))
+        summary2 = np.column_stack((stats2.mean(axis=1), stats2.std(axis=1)))
+        return np.concatenate((summary4.ravel(), summary2.ravel()))
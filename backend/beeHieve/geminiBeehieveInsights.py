@@ -1,10 +1,27 @@
 import os
+import sys
 import json
-import requests
+import re
 import pandas as pd
 import time
 from dotenv import load_dotenv
 
+# The shared HTTP client lives in the backend directory, one level up; the
+# script runs from any working directory
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+from http_client import get_client
+
+# Insights are written next to this script, not into the working directory
+RESULTS_DIR = os.path.join(SCRIPT_DIR, "results")
+
+# Calls made when Gemini answers with text that is not valid JSON. Transport
+# errors, 429 and 5xx are already retried by the shared client, so they are
+# not retried again here
+JSON_ATTEMPTS = 3
+
 # Load environment variables first
 load_dotenv()
 
@@ -79,57 +96,38 @@ Your response must be solely the JSON object with no other text.
     print("Calling Gemini API...")
     gemini_json_response = {}
     
-    try:
-        max_retries = 3
-        retry_count = 0
+    for attempt in range(1, JSON_ATTEMPTS + 1):
+        try:
+            response = get_client().post(url, headers=headers, json=data)
+            response.raise_for_status()
+            
+            # Extract text content from the Gemini response
+            response_text = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            print(f"Received Gemini response (truncated): {response_text[:200]}...")
+        
+        except Exception as e:
+            print(f"ERROR calling Gemini API: {e}")
+            return generate_local_insights(analysis_data)
         
-        while retry_count < max_retries:
-            try:
-                response = requests.post(url, headers=headers, json=data)
-                response.raise_for_status()
-                
-                response_json = response.json()
-                
-                # Extract text content from the Gemini response
-                response_text = response_json["candidates"][0]["content"]["parts"][0]["text"]
-                print(f"Received Gemini response (truncated): {response_text[:200]}...")
-                
+        try:
+            # Parse the JSON response
+            gemini_json_response = json.loads(response_text)
+            break
+            
+        except json.JSONDecodeError:
+            print("Warning: Invalid JSON response from Gemini. Attempting to extract JSON...")
+            
+            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+            if json_match:
                 try:
-                    # Parse the JSON response
-                    gemini_json_response = json.loads(response_text)
+                    gemini_json_response = json.loads(json_match.group(0))
                     break
-                    
                 except json.JSONDecodeError:
-                    print("Warning: Invalid JSON response from Gemini. Attempting to extract JSON...")
-                    
-                    import re
-                    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                    if json_match:
-                        try:
-                            gemini_json_response = json.loads(json_match.group(0))
-                            break
-                        except json.JSONDecodeError:
-                            print("Failed to extract JSON from match pattern")
-                            
-                    retry_count += 1
-                    if retry_count < max_retries:
-                        print(f"Retrying Gemini API call ({retry_count}/{max_retries})...")
-                        time.sleep(1)
-                    else:
-                        return generate_local_insights(analysis_data)
-            
-            except Exception as e:
-                print(f"Error in Gemini API call: {e}")
-                retry_count += 1
-                if retry_count < max_retries:
-                    print(f"Retrying Gemini API call ({retry_count}/{max_retries})...")
-                    time.sleep(1)
-                else:
-                    return generate_local_insights(analysis_data)
-    
-    except Exception as e:
-        print(f"ERROR calling Gemini API: {e}")
-        return generate_local_insights(analysis_data)
+                    print("Failed to extract JSON from match pattern")
+        
+        if attempt < JSON_ATTEMPTS:
+            print(f"Retrying Gemini API call ({attempt}/{JSON_ATTEMPTS})...")
+            time.sleep(1)
     
     # Check if we have a valid response
     if not gemini_json_response or not isinstance(gemini_json_response, dict):
@@ -330,9 +328,9 @@ def main():
     print(json.dumps(insights, indent=2))
     
     # Save insights to file
-    os.makedirs("results", exist_ok=True)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
     filename_base = os.path.splitext(analysis_data['filename'])[0]
-    output_path = os.path.join("results", f"{filename_base}_gemini_insights.json")
+    output_path = os.path.join(RESULTS_DIR, f"{filename_base}_gemini_insights.json")
     
     with open(output_path, 'w') as f:
         json.dump(insights, f, indent=2)
@@ -1,4 +1,22 @@
+"""
+Celery app, task routing and worker launch profiles
+
+Tasks are routed by workload class so slow I/O cannot starve CPU-bound work:
+
+    cpu    Image analysis and model inference. Prefork pool autoscaled up to
+           one process per core, prefetching one task at a time.
+    io     Mongo, weather and Gemini calls. Thread pool with high
+           concurrency, since these tasks mostly wait on the network.
+
+Start a worker for one class with `python celery_worker.py <profile>`, where
+profile is cpu, io or all (every queue in one worker, the default for
+docker compose). Pool sizes come from the *_WORKER_* environment variables.
+"""
+import os
+import sys
 from celery import Celery
+from celery.signals import worker_init, worker_shutdown, worker_process_init, worker_process_shutdown
+from kombu import Queue
 
 # Use Redis inside Docker network
 celery_app = Celery(
@@ -7,7 +25,56 @@ celery_app = Celery(
     backend="redis://redis:6379/0"
 )
 
+CPU_WORKER_MAX = int(os.getenv("CPU_WORKER_MAX", os.cpu_count() or 1))
+CPU_WORKER_MIN = int(os.getenv("CPU_WORKER_MIN", 1))
+IO_WORKER_CONCURRENCY = int(os.getenv("IO_WORKER_CONCURRENCY", 32))
+
+celery_app.conf.update(
+    task_queues=(Queue("cpu"), Queue("io")),
+    task_default_queue="io",
+    # Exact names are matched before patterns
+    task_routes={
+        "land.analyze_image": {"queue": "cpu"},
+        "land.model_insights": {"queue": "cpu"},
+        "batch.analyze_frames": {"queue": "cpu"},
+        "process_event": {"queue": "io"},
+        "land.*": {"queue": "io"},
+    },
+)
+
+WORKER_PROFILES = {
+    "cpu": [
+        "--queues=cpu", "--pool=prefork", f"--autoscale={CPU_WORKER_MAX},{CPU_WORKER_MIN}",
+        "--prefetch-multiplier=1", "-O", "fair", "--hostname=cpu@%h",
+    ],
+    "io": [
+        "--queues=io", "--pool=threads", f"--concurrency={IO_WORKER_CONCURRENCY}",
+        "--prefetch-multiplier=4", "--hostname=io@%h",
+    ],
+    "all": ["--queues=cpu,io"],
+}
+
 import process_task
+from model_registry import warm_models
+from worker_runtime import init_main_runtime, init_worker_runtime, shutdown_worker_runtime
+
+# Load the farm models once per worker process instead of once per task
+worker_process_init.connect(warm_models)
+
+# One event loop and Mongo client per worker process, shared by every task.
+# The process signals fire only in prefork children; thread and solo pools
+# run tasks in the main process, which gets the worker signals.
+worker_process_init.connect(init_worker_runtime)
+worker_process_shutdown.connect(shutdown_worker_runtime)
+worker_init.connect(init_main_runtime)
+worker_shutdown.connect(shutdown_worker_runtime)
 
 if __name__ == "__main__":
-    celery_app.start()
+    # Run as a script, this file is loaded twice; the tasks are registered on
+    # the app of the imported celery_worker module
+    from celery_worker import celery_app
+    
+    if len(sys.argv) > 1 and sys.argv[1] in WORKER_PROFILES:
+        celery_app.worker_main(["worker", "--loglevel=info", *WORKER_PROFILES[sys.argv[1]], *sys.argv[2:]])
+    else:
+        celery_app.start()
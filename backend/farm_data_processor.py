@@ -9,10 +9,109 @@ from sklearn.metrics import mean_squared_error, classification_report
 from sklearn.impute import SimpleImputer
 import joblib
 import json
-import requests
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from weather import AccuWeatherProvider, WEATHER_PROVIDER, get_weather
+
+NUTRIENTS = ('N', 'P', 'K')
+
+# Weather used when AccuWeather cannot be reached
+DEFAULT_WEATHER = {
+    'temperature': 25.0,  # Default value in Celsius
+    'humidity': 70.0,     # Default value as percentage
+    'rainfall': 5.0       # Default value in mm
+}
+
+# Last axis of FarmDataProcessor.nutrient_table
+NUTRIENT_RANGE_FIELDS = ('min', 'ideal', 'max')
+
+# compare_nutrients status codes -1, 0 and 1, indexed by code + 1
+NUTRIENT_FIT_STATUSES = ('deficit', 'optimal', 'excess')
+
+# Labels for the threshold bins used by the soil health analysis
+NUTRIENT_STATUSES = ('Deficient', 'Below optimal', 'Optimal', 'Excessive')
+MOISTURE_INTERPRETATIONS = (
+    "Dry - Irrigation needed",
+    "Moderate - Monitor moisture",
+    "Good - Optimal moisture",
+    "Wet - Potential drainage issues"
+)
+GROWTH_INTERPRETATIONS = (
+    "Poor - Major improvements needed",
+    "Fair - Some improvements needed",
+    "Good - Minor adjustments may help",
+    "Excellent - Optimal growing conditions"
+)
+
+# Bin edges of the moisture index and growth potential interpretations
+INDEX_BIN_EDGES = (0.3, 0.6, 0.8)
+
+def nutrient_actions(nutrient):
+    """Fertilization advice for a nutrient, indexed like NUTRIENT_STATUSES."""
+    return (
+        f'Increase {nutrient} fertilization',
+        f'Moderate {nutrient} fertilization needed',
+        'Maintain current fertilization',
+        f'Reduce {nutrient} fertilization'
+    )
+
+def get_field_weather(lat, lon, api_key=None):
+    """
+    Get the weather readings the farm models score with at a location
+    
+    Readings come from AccuWeather through the shared weather cache.
+    
+    Args:
+        lat (float): Latitude
+        lon (float): Longitude
+        api_key (str, optional): AccuWeather API key, ACCUWEATHER_API_KEY by default
+        
+    Returns:
+        dict: temperature, humidity and rainfall; DEFAULT_WEATHER if AccuWeather cannot be reached
+    """
+    if not (api_key or os.getenv("ACCUWEATHER_API_KEY")) and not WEATHER_PROVIDER:
+        raise ValueError("AccuWeather API key not found. Set ACCUWEATHER_API_KEY environment variable.")
+    
+    try:
+        return get_weather("accuweather", lat, lon)
+    except Exception as e:
+        print(f"Error fetching weather data: {e}")
+        return dict(DEFAULT_WEATHER)
+
+class SensorRecord:
+    """
+    A single sensor reading held in a fixed float64 array.
+    
+    The array is ordered as SensorRecord.FIELDS, matching
+    FarmDataProcessor.numerical_features, so a reading can be scored
+    without building a DataFrame.
+    """
+    
+    __slots__ = ('values', 'soil_type')
+    
+    FIELDS = ('N', 'P', 'K', 'temperature', 'humidity', 'rainfall')
+    
+    def __init__(self, N, P, K, temperature, humidity, rainfall, soil_type=None):
+        self.values = np.array([N, P, K, temperature, humidity, rainfall], dtype=np.float64)
+        self.soil_type = soil_type
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create a record from a sensor reading dict with the FIELDS keys and optional soil_type."""
+        return cls(*(data[field] for field in cls.FIELDS), soil_type=data.get('soil_type'))
+    
+    def __getattr__(self, name):
+        # Named access to the array, e.g. record.N. copy and pickle look up
+        # dunder methods on instances whose slots are not set yet, so only
+        # field names may read self.values.
+        if name not in SensorRecord.FIELDS:
+            raise AttributeError(name)
+        return self.values[SensorRecord.FIELDS.index(name)]
+    
+    def __repr__(self):
+        fields = ", ".join(f"{field}={value!r}" for field, value in zip(self.FIELDS, self.values.tolist()))
+        return f"SensorRecord({fields}, soil_type={self.soil_type!r})"
 
 class FarmDataProcessor:
     """
@@ -116,6 +215,69 @@ class FarmDataProcessor:
                 'K': {'min': 60, 'max': 120, 'ideal': 90}
             }
         }
+        
+        # Range used for crops that are not in crop_nutrient_ranges
+        self.default_nutrient_ranges = {
+            'N': {'min': 70, 'max': 120, 'ideal': 90},
+            'P': {'min': 30, 'max': 60, 'ideal': 45},
+            'K': {'min': 30, 'max': 60, 'ideal': 45}
+        }
+        
+        self.compile_nutrient_table()
+    
+    def compile_nutrient_table(self):
+        """
+        Compile crop_nutrient_ranges into a NumPy lookup table.
+        
+        Sets nutrient_table, of shape (crops + 1, 3 nutrients, 3), holding
+        NUTRIENT_RANGE_FIELDS for N, P and K, and crop_index, mapping lower-case
+        crop names to rows. The last row holds default_nutrient_ranges for
+        unknown crops. Call again after changing the ranges.
+        """
+        crops = list(self.crop_nutrient_ranges)
+        ranges = [self.crop_nutrient_ranges[crop] for crop in crops] + [self.default_nutrient_ranges]
+        self.nutrient_table = np.array([
+            [[crop_ranges[nutrient][field] for field in NUTRIENT_RANGE_FIELDS] for nutrient in NUTRIENTS]
+            for crop_ranges in ranges
+        ])
+        self.crop_index = {crop.lower(): i for i, crop in enumerate(crops)}
+    
+    def crop_rows(self, crop_names):
+        """Return the nutrient_table row of each crop, using the default row for unknown crops."""
+        default_row = len(self.nutrient_table) - 1
+        return np.array([self.crop_index.get(str(crop).lower(), default_row) for crop in crop_names], dtype=np.intp)
+    
+    def compare_nutrients(self, npk_values, crop_names):
+        """
+        Compare N, P and K readings against the ranges of a set of crops in one broadcast.
+        
+        Args:
+            npk_values (array-like): Readings of shape (fields, 3), or (3,) for one field
+            crop_names (list): Crops to compare against
+            
+        Returns:
+            dict: Arrays of shape (fields, crops, 3 nutrients): 'status' with
+            -1 for deficit, 0 for optimal and 1 for excess (index
+            NUTRIENT_FIT_STATUSES with status + 1), 'difference' from the
+            nearest range bound (0 when optimal), and 'min', 'ideal' and 'max'
+        """
+        values = np.atleast_2d(np.asarray(npk_values, dtype=np.float64))[:, None, :]
+        ranges = self.nutrient_table[self.crop_rows(crop_names)][None]
+        low, ideal, high = ranges[..., 0], ranges[..., 1], ranges[..., 2]
+        
+        deficit = values < low
+        excess = values > high
+        status = excess.astype(np.int8) - deficit.astype(np.int8)
+        difference = np.where(deficit, low - values, np.where(excess, values - high, 0.0))
+        shape = status.shape
+        
+        return {
+            'status': status,
+            'difference': difference,
+            'min': np.broadcast_to(low, shape),
+            'ideal': np.broadcast_to(ideal, shape),
+            'max': np.broadcast_to(high, shape)
+        }
     
     def create_preprocessor(self):
         """Create a preprocessing pipeline for sensor data."""
@@ -166,37 +328,12 @@ class FarmDataProcessor:
             raise ValueError("AccuWeather API key not found. Set ACCUWEATHER_API_KEY environment variable.")
         
         try:
-            # Get current conditions
-            current_url = f"http://dataservice.accuweather.com/currentconditions/v1/{location_key}?apikey={self.accuweather_api_key}&details=true"
-            current_response = requests.get(current_url)
-            current_data = current_response.json()[0]
-            
-            # Get 1-day forecast for rainfall
-            forecast_url = f"http://dataservice.accuweather.com/forecasts/v1/daily/1day/{location_key}?apikey={self.accuweather_api_key}&details=true&metric=true"
-            forecast_response = requests.get(forecast_url)
-            forecast_data = forecast_response.json()
-            
-            # Extract relevant data
-            temperature = current_data['Temperature']['Metric']['Value']
-            relative_humidity = current_data['RelativeHumidity']
-            
-            # Get rainfall from forecast
-            rainfall = forecast_data['DailyForecasts'][0]['Day']['RainValue']
-            
-            return {
-                'temperature': temperature,
-                'humidity': relative_humidity,
-                'rainfall': rainfall
-            }
-            
+            # Current conditions plus the 1-day forecast for rainfall
+            return AccuWeatherProvider(self.accuweather_api_key).conditions(location_key)
         except Exception as e:
             # Log error and return default values if API call fails
             print(f"Error fetching weather data: {e}")
-            return {
-                'temperature': 25.0,  # Default value in Celsius
-                'humidity': 70.0,     # Default value as percentage
-                'rainfall': 5.0       # Default value in mm
-            }
+            return dict(DEFAULT_WEATHER)
     
     def get_location_key(self, lat, lon):
         """
@@ -213,16 +350,13 @@ class FarmDataProcessor:
             raise ValueError("AccuWeather API key not found. Set ACCUWEATHER_API_KEY environment variable.")
         
         try:
-            geoposition_url = f"http://dataservice.accuweather.com/locations/v1/cities/geoposition/search?apikey={self.accuweather_api_key}&q={lat},{lon}"
-            response = requests.get(geoposition_url)
-            data = response.json()
-            return data['Key']
+            return AccuWeatherProvider(self.accuweather_api_key).location_key(lat, lon)
         except Exception as e:
             # Log error and return a default location key (New York City)
             print(f"Error fetching location key: {e}")
             return "349727"  # Default location key
             
-    def enrich_with_weather_data(self, data, lat=None, lon=None):
+    def enrich_with_weather_data(self, data, lat=None, lon=None, weather_data=None):
         """
         Enrich sensor data with weather data from AccuWeather
         
@@ -230,6 +364,8 @@ class FarmDataProcessor:
             data (dict or pd.DataFrame): Sensor data
             lat (float, optional): Latitude
             lon (float, optional): Longitude
+            weather_data (dict, optional): Readings from get_field_weather, fetched
+                earlier; lat and lon are then not looked up
             
         Returns:
             dict or pd.DataFrame: Enriched data
@@ -240,11 +376,11 @@ class FarmDataProcessor:
         else:
             data_df = data.copy()
         
-        # Get weather data
-        if lat is not None and lon is not None:
-            location_key = self.get_location_key(lat, lon)
-            weather_data = self.get_weather_data(location_key)
-            
+        # Get weather data, shared with nearby fields through the weather cache
+        if weather_data is None and lat is not None and lon is not None:
+            weather_data = get_field_weather(lat, lon, self.accuweather_api_key)
+        
+        if weather_data is not None:
             # Update dataframe with weather data
             data_df['temperature'] = weather_data['temperature']
             data_df['humidity'] = weather_data['humidity']
@@ -317,8 +453,82 @@ class FarmDataProcessor:
         
         return self
     
+    def engineer_record(self, record):
+        """
+        Compute the engineer_features derived metrics for one SensorRecord.
+        
+        Uses the same operations in the same order as engineer_features, so
+        the values are identical, without any DataFrame.
+        
+        Returns:
+            tuple: (NPK_balance, moisture_index, growth_potential) as floats
+        """
+        N, P, K, _, humidity, rainfall = record.values.tolist()
+        thresholds = self.soil_health_thresholds
+        
+        npk_balance = N / (P + K + 1)
+        moisture_index = (rainfall * 0.7 + humidity * 0.3) / 100
+        growth_potential = (
+            (N / thresholds['N']['optimal']) * 0.33 +
+            (P / thresholds['P']['optimal']) * 0.33 +
+            (K / thresholds['K']['optimal']) * 0.34
+        )
+        # Clip to [0, 1]; like pandas' clip, a NaN stays NaN
+        growth_potential = min(max(growth_potential, 0.0), 1.0)
+        
+        return npk_balance, moisture_index, growth_potential
+    
+    def analyze_soil_health_record(self, record):
+        """
+        Analyze soil health for a single SensorRecord without pandas.
+        
+        Returns the same dict as analyze_soil_health, which is kept as the
+        DataFrame reference implementation.
+        """
+        thresholds = self.soil_health_thresholds
+        npk = record.values[:3]
+        limits = np.array([
+            [thresholds[nutrient]['low'], thresholds[nutrient]['optimal'], thresholds[nutrient]['high']]
+            for nutrient in ('N', 'P', 'K')
+        ])
+        # Number of thresholds each value is not below; NaN counts as above all of them
+        levels = (~(npk[:, None] < limits)).sum(axis=1).tolist()
+        
+        soil_health = {}
+        for nutrient, value, level in zip(('N', 'P', 'K'), npk.tolist(), levels):
+            soil_health[nutrient] = {
+                'value': value,
+                'status': NUTRIENT_STATUSES[level],
+                'action': nutrient_actions(nutrient)[level]
+            }
+        
+        npk_balance, moisture_index, growth_potential = self.engineer_record(record)
+        
+        soil_health['derived_metrics'] = {
+            'NPK_balance': {
+                'value': npk_balance,
+                'interpretation': 'Ratio of nitrogen to phosphorus and potassium',
+                'status': 'Balanced' if 0.8 <= npk_balance <= 1.2 else 'Imbalanced'
+            },
+            'moisture_index': {
+                'value': moisture_index,
+                'interpretation': 'Combined measure of soil moisture from rainfall and humidity',
+                'status': MOISTURE_INTERPRETATIONS[np.searchsorted(INDEX_BIN_EDGES, moisture_index, side='right')]
+            },
+            'growth_potential': {
+                'value': growth_potential,
+                'interpretation': 'Overall growing condition score (0-1)',
+                'status': GROWTH_INTERPRETATIONS[np.searchsorted(INDEX_BIN_EDGES, growth_potential, side='right')]
+            }
+        }
+        
+        return soil_health
+    
     def analyze_soil_health(self, sensor_data):
         """Analyze soil health based on sensor data."""
+        if isinstance(sensor_data, SensorRecord):
+            return self.analyze_soil_health_record(sensor_data)
+        
         # Convert single row to dataframe if needed
         if not isinstance(sensor_data, pd.DataFrame):
             sensor_data = pd.DataFrame([sensor_data])
@@ -396,54 +606,187 @@ class FarmDataProcessor:
     
     def predict_crop_yield(self, sensor_data):
         """Predict crop yield based on sensor data."""
+        return float(self.predict_crop_yield_batch(sensor_data)[0])
+    
+    def recommend_crops(self, sensor_data):
+        """Recommend suitable crops based on sensor data."""
+        return self.recommend_crops_batch(sensor_data)[0]
+    
+    def to_frame(self, sensor_data):
+        """
+        Convert sensor readings to a DataFrame with one row per reading.
+        
+        Args:
+            sensor_data (dict, list of dicts, pd.DataFrame or np.ndarray): Readings;
+                an array has one row per reading with the columns
+                numerical_features + categorical_features
+                
+        Returns:
+            pd.DataFrame: The readings
+        """
+        if isinstance(sensor_data, pd.DataFrame):
+            return sensor_data
+        if isinstance(sensor_data, dict):
+            return pd.DataFrame([sensor_data])
+        if isinstance(sensor_data, np.ndarray):
+            columns = self.numerical_features + self.categorical_features
+            frame = pd.DataFrame(np.atleast_2d(sensor_data), columns=columns)
+            return frame.astype({feature: float for feature in self.numerical_features})
+        return pd.DataFrame(list(sensor_data))
+    
+    def prepare_batch(self, sensor_data):
+        """
+        Engineer and preprocess a batch of readings once for all models.
+        
+        Returns:
+            tuple: (engineered pd.DataFrame, preprocessed model input)
+        """
+        X_derived = self.engineer_features(self.to_frame(sensor_data))
+        return X_derived, self.preprocess_data(X_derived)
+    
+    def predict_crop_yield_batch(self, sensor_data, prepared=None):
+        """
+        Predict crop yield for every reading with a single model call.
+        
+        Args:
+            sensor_data: Readings in any format accepted by to_frame
+            prepared (tuple, optional): prepare_batch output for sensor_data
+            
+        Returns:
+            np.ndarray: Predicted yield per reading
+        """
         if self.crop_yield_model is None:
             raise ValueError("Crop yield model not trained. Call train_crop_yield_model first.")
         
-        # Convert to dataframe if needed
-        if not isinstance(sensor_data, pd.DataFrame):
-            sensor_data = pd.DataFrame([sensor_data])
+        _, X_preprocessed = prepared or self.prepare_batch(sensor_data)
+        return self.crop_yield_model.predict(X_preprocessed)
+    
+    def recommend_crops_batch(self, sensor_data, prepared=None, top_n=5):
+        """
+        Recommend suitable crops for every reading with a single model call.
         
-        # Engineer features
-        X_derived = self.engineer_features(sensor_data)
+        Args:
+            sensor_data: Readings in any format accepted by to_frame
+            prepared (tuple, optional): prepare_batch output for sensor_data
+            top_n (int): Number of crops to return per reading
+            
+        Returns:
+            list: Per reading, the top crops as {"crop", "suitability_score"}
+        """
+        if self.crop_recommendation_model is None:
+            raise ValueError("Crop recommendation model not trained. Call train_crop_recommendation_model first.")
         
-        # Preprocess
-        X_preprocessed = self.preprocess_data(X_derived)
+        _, X_preprocessed = prepared or self.prepare_batch(sensor_data)
+        probabilities = self.crop_recommendation_model.predict_proba(X_preprocessed)
+        crop_names = self.crop_recommendation_model.classes_
         
-        # Predict
-        yield_prediction = self.crop_yield_model.predict(X_preprocessed)
+        # Stable sort on the negated scores keeps ties in class order, like sorted()
+        top = np.argsort(-probabilities, axis=1, kind='stable')[:, :top_n]
+        top_scores = np.take_along_axis(probabilities, top, axis=1)
         
-        return float(yield_prediction[0])
+        return [
+            [
+                {"crop": crop_names[i], "suitability_score": float(score)}
+                for i, score in zip(row, scores)
+            ]
+            for row, scores in zip(top, top_scores)
+        ]
     
-    def recommend_crops(self, sensor_data):
-        """Recommend suitable crops based on sensor data."""
-        if self.crop_recommendation_model is None:
-            raise ValueError("Crop recommendation model not trained. Call train_crop_recommendation_model first.")
+    def analyze_soil_health_batch(self, sensor_data, prepared=None):
+        """
+        Analyze soil health for every reading, classifying all rows at once.
         
-        # Convert to dataframe if needed
-        if not isinstance(sensor_data, pd.DataFrame):
-            sensor_data = pd.DataFrame([sensor_data])
+        Args:
+            sensor_data: Readings in any format accepted by to_frame
+            prepared (tuple, optional): prepare_batch output for sensor_data
+            
+        Returns:
+            list: Per reading, the same dict as analyze_soil_health
+        """
+        if prepared is not None:
+            engineered_data = prepared[0]
+        else:
+            engineered_data = self.engineer_features(self.to_frame(sensor_data))
         
-        # Engineer features
-        X_derived = self.engineer_features(sensor_data)
+        # Bin index 0..3: below low, below optimal, below high, at or above high
+        nutrients = {}
+        for nutrient in ['N', 'P', 'K']:
+            thresholds = self.soil_health_thresholds[nutrient]
+            values = engineered_data[nutrient].to_numpy(dtype=float)
+            levels = np.searchsorted(
+                [thresholds['low'], thresholds['optimal'], thresholds['high']], values, side='right'
+            )
+            nutrients[nutrient] = (values, levels, nutrient_actions(nutrient))
+        
+        npk_balance = engineered_data['NPK_balance'].to_numpy(dtype=float)
+        moisture_index = engineered_data['moisture_index'].to_numpy(dtype=float)
+        growth_potential = engineered_data['growth_potential'].to_numpy(dtype=float)
+        balanced = (npk_balance >= 0.8) & (npk_balance <= 1.2)
+        moisture_levels = np.searchsorted(INDEX_BIN_EDGES, moisture_index, side='right')
+        growth_levels = np.searchsorted(INDEX_BIN_EDGES, growth_potential, side='right')
+        
+        results = []
+        for row in range(len(engineered_data)):
+            soil_health = {}
+            for nutrient, (values, levels, actions) in nutrients.items():
+                soil_health[nutrient] = {
+                    'value': float(values[row]),
+                    'status': NUTRIENT_STATUSES[levels[row]],
+                    'action': actions[levels[row]]
+                }
+            
+            soil_health['derived_metrics'] = {
+                'NPK_balance': {
+                    'value': float(npk_balance[row]),
+                    'interpretation': 'Ratio of nitrogen to phosphorus and potassium',
+                    'status': 'Balanced' if balanced[row] else 'Imbalanced'
+                },
+                'moisture_index': {
+                    'value': float(moisture_index[row]),
+                    'interpretation': 'Combined measure of soil moisture from rainfall and humidity',
+                    'status': MOISTURE_INTERPRETATIONS[moisture_levels[row]]
+                },
+                'growth_potential': {
+                    'value': float(growth_potential[row]),
+                    'interpretation': 'Overall growing condition score (0-1)',
+                    'status': GROWTH_INTERPRETATIONS[growth_levels[row]]
+                }
+            }
+            results.append(soil_health)
         
-        # Preprocess
-        X_preprocessed = self.preprocess_data(X_derived)
+        return results
+    
+    def score_batch(self, sensor_data):
+        """
+        Run soil analysis and every trained model on a batch of readings.
         
-        # Get probability scores for each crop
-        crop_probabilities = self.crop_recommendation_model.predict_proba(X_preprocessed)[0]
+        Features are engineered and preprocessed once and each model is
+        called once for the whole batch.
         
-        # Get crop names and sort by probability
-        crop_names = self.crop_recommendation_model.classes_
-        crop_scores = [(crop, float(prob)) for crop, prob in zip(crop_names, crop_probabilities)]
-        crop_scores.sort(key=lambda x: x[1], reverse=True)
+        Args:
+            sensor_data: Readings in any format accepted by to_frame
+            
+        Returns:
+            list: Per reading, a dict with 'soil_health' and, when the models
+            are trained, 'crop_recommendations' and 'predicted_yield'
+        """
+        frame = self.to_frame(sensor_data)
+        needs_models = self.crop_recommendation_model is not None or self.crop_yield_model is not None
+        prepared = self.prepare_batch(frame) if needs_models else (self.engineer_features(frame), None)
         
-        # Return top recommended crops
-        return [
-            {"crop": crop, "suitability_score": score}
-            for crop, score in crop_scores[:5]  # Top 5 recommendations
-        ]
+        results = [{'soil_health': soil_health} for soil_health in self.analyze_soil_health_batch(frame, prepared)]
+        
+        if self.crop_recommendation_model is not None:
+            for result, recommendations in zip(results, self.recommend_crops_batch(frame, prepared)):
+                result['crop_recommendations'] = recommendations
+        
+        if self.crop_yield_model is not None:
+            for result, predicted_yield in zip(results, self.predict_crop_yield_batch(frame, prepared)):
+                result['predicted_yield'] = float(predicted_yield)
+        
+        return results
     
-    def generate_insights(self, sensor_data, lat=None, lon=None):
+    def generate_insights(self, sensor_data, lat=None, lon=None, weather_data=None):
         """
         Generate insights from sensor data to be sent to Gemini AI.
         
@@ -451,13 +794,15 @@ class FarmDataProcessor:
             sensor_data (dict or pd.DataFrame): NPK sensor data
             lat (float, optional): Latitude for weather data
             lon (float, optional): Longitude for weather data
+            weather_data (dict, optional): Readings from get_field_weather; when
+                given, no weather is fetched
             
         Returns:
             dict: Generated insights
         """
-        # Enrich with weather data if coordinates provided
-        if lat is not None and lon is not None:
-            sensor_data = self.enrich_with_weather_data(sensor_data, lat, lon)
+        # Enrich with weather data if readings or coordinates provided
+        if weather_data is not None or (lat is not None and lon is not None):
+            sensor_data = self.enrich_with_weather_data(sensor_data, lat, lon, weather_data)
         
         # Convert to dataframe if needed
         if not isinstance(sensor_data, pd.DataFrame):
@@ -487,16 +832,19 @@ class FarmDataProcessor:
             'soil_type': sensor_data['soil_type'].values[0]
         }
             
-        # Soil health analysis
-        insights['soil_health'] = self.analyze_soil_health(sensor_data)
-        
-        # Crop recommendations (if model is trained)
-        if self.crop_recommendation_model is not None:
-            insights['crop_recommendations'] = self.recommend_crops(sensor_data)
-        
-        # Yield prediction (if model is trained)
-        if self.crop_yield_model is not None:
-            insights['predicted_yield'] = self.predict_crop_yield(sensor_data)
+        # Soil health comes from the pandas-free record path; only the trained
+        # models need the features engineered and preprocessed as a DataFrame
+        insights['soil_health'] = self.analyze_soil_health_record(
+            SensorRecord.from_dict(insights['raw_sensor_data'])
+        )
+        
+        if self.crop_recommendation_model is not None or self.crop_yield_model is not None:
+            frame = sensor_data.iloc[:1]
+            prepared = self.prepare_batch(frame)
+            if self.crop_recommendation_model is not None:
+                insights['crop_recommendations'] = self.recommend_crops_batch(frame, prepared)[0]
+            if self.crop_yield_model is not None:
+                insights['predicted_yield'] = float(self.predict_crop_yield_batch(frame, prepared)[0])
         
         # Format data for Gemini AI API
         gemini_prompt = self._format_for_gemini(insights)
@@ -519,11 +867,7 @@ class FarmDataProcessor:
             return self.crop_nutrient_ranges[crop_name]
         else:
             # Return a generic range if crop is not in our database
-            return {
-                'N': {'min': 70, 'max': 120, 'ideal': 90},
-                'P': {'min': 30, 'max': 60, 'ideal': 45},
-                'K': {'min': 30, 'max': 60, 'ideal': 45}
-            }
+            return self.default_nutrient_ranges
     
     def _format_for_gemini(self, insights):
         """Format insights as JSON for the Gemini AI API."""
@@ -548,41 +892,31 @@ class FarmDataProcessor:
         
         # Add crop recommendations if available
         if 'crop_recommendations' in insights:
+            recommendations = insights['crop_recommendations']
+            
+            # Compare against every recommended crop at once for frontend visualization
+            comparison = self.compare_nutrients(
+                [raw_data[nutrient] for nutrient in NUTRIENTS],
+                [rec['crop'] for rec in recommendations]
+            )
+            fields = {key: comparison[key][0].tolist() for key in ('status', 'difference', 'min', 'ideal', 'max')}
+            
             crop_recs = []
-            for rec in insights['crop_recommendations']:
-                crop_name = rec['crop']
-                nutrient_ranges = self.get_nutrient_ranges_for_crop(crop_name)
-                
-                # Prepare comparison data for frontend visualization
+            for i, rec in enumerate(recommendations):
                 comparison_data = {}
-                for nutrient in ['N', 'P', 'K']:
-                    actual_value = raw_data[nutrient]
-                    ideal_value = nutrient_ranges[nutrient]['ideal']
-                    min_value = nutrient_ranges[nutrient]['min']
-                    max_value = nutrient_ranges[nutrient]['max']
-                    
-                    # Calculate deficit or excess
-                    if actual_value < min_value:
-                        status = "deficit"
-                        difference = min_value - actual_value
-                    elif actual_value > max_value:
-                        status = "excess"
-                        difference = actual_value - max_value
-                    else:
-                        status = "optimal"
-                        difference = 0
-                    
+                for j, nutrient in enumerate(NUTRIENTS):
+                    status = NUTRIENT_FIT_STATUSES[fields['status'][i][j] + 1]
                     comparison_data[nutrient] = {
-                        "actual": actual_value,
-                        "ideal": ideal_value,
-                        "min": min_value,
-                        "max": max_value,
+                        "actual": raw_data[nutrient],
+                        "ideal": fields['ideal'][i][j],
+                        "min": fields['min'][i][j],
+                        "max": fields['max'][i][j],
                         "status": status,
-                        "difference": difference
+                        "difference": fields['difference'][i][j] if status != "optimal" else 0
                     }
                 
                 crop_recs.append({
-                    "crop": crop_name,
+                    "crop": rec['crop'],
                     "suitability_score": rec['suitability_score'],
                     "nutrient_comparison": comparison_data
                 })
@@ -0,0 +1,247 @@
+"""
+Field boundary masks and management zones for map snapshots
+
+The dashboard snapshot is the map view fitted to the drawn field's extent
+with FIT_PADDING pixels of padding, in Web Mercator. That fit is replayed
+here to place the stored lon/lat boundary on the image, so analysis can be
+restricted to pixels inside the field and optionally split into a grid of
+management zones.
+
+Zone statistics are accumulated with np.bincount over a label raster in
+which 0 is outside the field and 1..n_zones are the zones, so every zone is
+counted in the same vectorized pass.
+"""
+import numpy as np
+
+# Padding, in pixels, used by the dashboard when fitting the map to the field
+FIT_PADDING = 20
+
+# Web Mercator (EPSG:3857) sphere radius, as used by OpenLayers
+EARTH_RADIUS = 6378137.0
+
+
+def _normalize_rings(coordinates):
+    """
+    Return the boundary as a list of (N, 2) float arrays of [lon, lat]
+
+    Accepts the dashboard's polygon format (a list of rings of [lon, lat]
+    pairs, outer ring first), a single ring, or a list of {"lat", "lon"} dicts.
+    """
+    if not coordinates:
+        raise ValueError("Field boundary has no coordinates")
+
+    first = coordinates[0]
+    if isinstance(first, dict):
+        rings = [[(point["lon"], point["lat"]) for point in coordinates]]
+    elif np.ndim(first) == 1:
+        rings = [coordinates]
+    else:
+        rings = coordinates
+
+    rings = [np.asarray(ring, dtype=np.float64) for ring in rings]
+    if any(ring.ndim != 2 or ring.shape[1] != 2 or len(ring) < 3 for ring in rings):
+        raise ValueError("Field boundary rings must have at least 3 [lon, lat] points")
+    return rings
+
+
+def field_center(coordinates):
+    """Return the (lat, lon) centre of a field boundary's bounding box"""
+    outer = _normalize_rings(coordinates)[0]
+    lon, lat = (outer.min(axis=0) + outer.max(axis=0)) / 2
+    return float(lat), float(lon)
+
+
+def fill_rings(rings, y0, y1, x0, x1):
+    """
+    Rasterize polygon rings over a window with the even-odd rule
+
+    A pixel is inside when its centre is. Every decision is made in image
+    coordinates, so filling tiles one by one gives exactly the same pixels
+    as filling the whole image at once.
+
+    Args:
+        rings: (N, 2) float arrays of [x, y] pixel-centre coordinates
+        y0, y1, x0, x1: Window to fill
+
+    Returns:
+        np.ndarray: uint8 array of shape (y1 - y0, x1 - x0), 1 inside
+    """
+    starts = np.concatenate(rings)
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    ys = np.arange(y0, y1, dtype=np.float64)[:, None]
+
+    # Half-open rule so a vertex shared by two edges is crossed exactly once
+    ya, yb = starts[:, 1], ends[:, 1]
+    crosses = (ya <= ys) != (yb <= ys)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at = starts[:, 0] + (ys - ya) * (ends[:, 0] - starts[:, 0]) / (yb - ya)
+
+    # Each crossing toggles every pixel whose centre lies to its right
+    rows, edges = np.nonzero(crosses)
+    first = np.clip(np.floor(x_at[rows, edges]).astype(np.int64) + 1 - x0, 0, x1 - x0)
+    toggles = np.zeros((y1 - y0, x1 - x0 + 1), dtype=np.uint8)
+    np.add.at(toggles, (rows, first), 1)
+    return (np.cumsum(toggles[:, :-1], axis=1, dtype=np.int32) & 1).astype(np.uint8)
+
+
+def lonlat_to_mercator(lonlat):
+    """Project an (N, 2) array of [lon, lat] degrees to Web Mercator metres"""
+    lon = np.radians(lonlat[:, 0])
+    lat = np.radians(np.clip(lonlat[:, 1], -85.06, 85.06))
+    return np.column_stack((EARTH_RADIUS * lon, EARTH_RADIUS * np.log(np.tan(np.pi / 4 + lat / 2))))
+
+
+class FieldZones:
+    """
+    A field boundary and its management-zone grid, placed on a snapshot
+
+    Args:
+        coordinates: Field boundary as stored in land.coordinates
+        zone_grid: (rows, cols) grid laid over the field's bounding box, or
+            None to treat the whole field as one zone
+        padding: Padding the snapshot was fitted with, in pixels
+    """
+
+    def __init__(self, coordinates, zone_grid=None, padding=FIT_PADDING):
+        self.rings = _normalize_rings(coordinates)
+        self.zone_grid = tuple(int(n) for n in zone_grid) if zone_grid else (1, 1)
+        if len(self.zone_grid) != 2 or min(self.zone_grid) < 1:
+            raise ValueError(f"zone_grid must be a pair of positive integers, got {zone_grid}")
+        self.padding = padding
+        self._placements = {}
+
+    @property
+    def n_zones(self):
+        return self.zone_grid[0] * self.zone_grid[1]
+
+    def params(self):
+        """Return a JSON-serialisable description, for cache keys and render specs"""
+        return {
+            "coordinates": [ring.tolist() for ring in self.rings],
+            "zone_grid": list(self.zone_grid),
+            "padding": self.padding,
+        }
+
+    @classmethod
+    def from_params(cls, params):
+        """Create the FieldZones described by params"""
+        return cls(params["coordinates"], params["zone_grid"], params["padding"])
+
+    def pixel_rings(self, height, width):
+        """
+        Return the boundary rings in pixel coordinates of a height x width snapshot
+
+        Replays the map view fit: the field's Mercator extent is centred and
+        scaled to the largest resolution that fits inside the padded frame.
+        """
+        placement = self._placements.get((height, width))
+        if placement is None:
+            projected = [lonlat_to_mercator(ring) for ring in self.rings]
+            outer = projected[0]
+            low, high = outer.min(axis=0), outer.max(axis=0)
+            extent = high - low
+            frame = np.array([width, height], dtype=np.float64) - 2 * self.padding
+            if np.any(frame <= 0):
+                raise ValueError(f"Image of {width}x{height} is too small for {self.padding}px padding")
+            if not np.any(extent > 0):
+                raise ValueError("Field boundary has an empty extent")
+
+            resolution = np.max(extent / frame)
+            center = (low + high) / 2
+            placement = []
+            for ring in projected:
+                pixels = np.empty_like(ring)
+                pixels[:, 0] = width / 2 + (ring[:, 0] - center[0]) / resolution
+                pixels[:, 1] = height / 2 - (ring[:, 1] - center[1]) / resolution
+                # Pixel centres sit at half-integer map coordinates
+                placement.append(pixels - 0.5)
+            self._placements[(height, width)] = placement
+        return placement
+
+    def labels(self, height, width, y0=0, y1=None, x0=0, x1=None):
+        """
+        Return the zone label raster for a window of a height x width snapshot
+
+        Args:
+            height, width: Size of the full snapshot
+            y0, y1, x0, x1: Window to label, the whole snapshot by default
+
+        Returns:
+            np.ndarray: int32 labels of the window, 0 outside the field and
+            1..n_zones inside it
+        """
+        y1 = height if y1 is None else y1
+        x1 = width if x1 is None else x1
+        rings = self.pixel_rings(height, width)
+
+        inside = fill_rings(rings, y0, y1, x0, x1)
+
+        # Zones split the outer ring's bounding box into an even grid
+        rows, cols = self.zone_grid
+        left, top = rings[0].min(axis=0)
+        right, bottom = rings[0].max(axis=0)
+        row = np.floor((np.arange(y0, y1) - top) * rows / max(bottom - top, 1e-9))
+        col = np.floor((np.arange(x0, x1) - left) * cols / max(right - left, 1e-9))
+        row = np.clip(row, 0, rows - 1).astype(np.int32)
+        col = np.clip(col, 0, cols - 1).astype(np.int32)
+
+        labels = row[:, None] * cols + col[None, :] + 1
+        labels *= inside
+        return labels
+
+
+class ZoneAccumulator:
+    """
+    Per-zone plant, unhealthy and soil pixel counts, accumulated over tiles
+
+    Uses the same formulas as ImageProcessor for health and moisture, so the
+    totals over all zones equal the field-level figures.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        size = field.n_zones + 1
+        # Rows: field pixels, plant, unhealthy and soil pixels
+        self._counts = np.zeros((4, size), dtype=np.int64)
+        self._soil_color_sum = np.zeros((3, size), dtype=np.float64)
+
+    def update(self, labels, rgb, plant_mask, unhealthy_mask, soil_mask):
+        """Add one tile; labels is the FieldZones.labels window matching the masks"""
+        size = self._counts.shape[1]
+        flat = labels.ravel()
+        self._counts[0] += np.bincount(flat, minlength=size)
+        for i, mask in enumerate((plant_mask, unhealthy_mask, soil_mask), start=1):
+            self._counts[i] += np.bincount(flat[mask.ravel() > 0], minlength=size)
+
+        soil = soil_mask.ravel() > 0
+        soil_labels = flat[soil]
+        soil_pixels = rgb.reshape(-1, 3)[soil]
+        for c in range(3):
+            self._soil_color_sum[c] += np.bincount(soil_labels, weights=soil_pixels[:, c], minlength=size)
+
+    def zones(self):
+        """
+        Returns:
+            list: A dict per zone that overlaps the field, with its grid
+            position, field pixel count, plant health and soil moisture
+        """
+        field_pixels, plant, unhealthy, soil = self._counts[:, 1:]
+        soil_color_sum = self._soil_color_sum[:, 1:]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            health = np.where(plant > 0, 100 - unhealthy / plant * 100, 0.0)
+            avg_color = np.floor(soil_color_sum / soil).T
+            moisture = np.where(soil > 0, 100 - np.nan_to_num(avg_color).mean(axis=1) / 255 * 100, 0.0)
+
+        cols = self.field.zone_grid[1]
+        return [
+            {
+                "zone": int(i),
+                "row": int(i // cols),
+                "col": int(i % cols),
+                "pixel_count": int(field_pixels[i]),
+                "plant_health_percentage": round(float(health[i]), 2),
+                "estimated_soil_moisture": round(float(moisture[i]), 2),
+            }
+            for i in np.flatnonzero(field_pixels)
+        ]
@@ -1,12 +1,15 @@
 import pandas as pd
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import os
 import json
 import base64
-import requests
 import time
 from pathlib import Path
-from farm_data_processor import FarmDataProcessor, load_example_data
+from concurrent.futures import ThreadPoolExecutor
+from model_registry import model_registry
+from weather import WEATHER_PROVIDER, get_weather
+from farm_data_processor import get_field_weather
 from dotenv import load_dotenv
 
 # Load environment variables first
@@ -20,14 +23,38 @@ else:
     print(f"Gemini API Key found: {GEMINI_API_KEY[:5]}...")
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Soil readings the insights are generated for until live sensors are connected
+SENSOR_DATA = {
+    'N': 95,
+    'P': 52,
+    'K': 50,
+    'humidity': 70,
+    'soil_type': 'Clay'
+}
+
+# Gemini errors a later call may not hit
+GEMINI_TRANSIENT_ERRORS = (
+    google_exceptions.ServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.RetryError,
+    ConnectionError,
+    TimeoutError,
+)
+
+class GeminiFallback(Exception):
+    """Raised by synthesize_gemini_insights(fallback=False) where it would return create_fallback_output."""
+
+class GeminiCallFailed(GeminiFallback):
+    """The Gemini call failed transiently or returned no usable JSON; a later attempt may succeed."""
+
 # OpenWeatherMap API key
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 if not OPENWEATHER_API_KEY:
     print("WARNING: OPENWEATHER_API_KEY not found in environment variables")
 
 def get_weather_data(lat, lon):
-    """Get weather data using OpenWeatherMap API."""
-    if not OPENWEATHER_API_KEY:
+    """Get weather data using OpenWeatherMap API, cached per area across workers."""
+    if not OPENWEATHER_API_KEY and not WEATHER_PROVIDER:
         print("WARNING: Cannot fetch weather data - OPENWEATHER_API_KEY not set")
         return {
             "temperature": 25.0,
@@ -39,20 +66,7 @@ def get_weather_data(lat, lon):
         }
         
     try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
-        response.raise_for_status()
-        weather_data = response.json()
-        
-        return {
-            "temperature": weather_data["main"]["temp"],
-            "humidity": weather_data["main"]["humidity"],
-            "precipitation": weather_data.get("rain", {}).get("1h", 0),
-            "wind_speed": weather_data["wind"]["speed"],
-            "conditions": weather_data["weather"][0]["main"],
-            "description": weather_data["weather"][0]["description"]
-        }
-        
+        return get_weather("openweather", lat, lon)
     except Exception as e:
         print(f"Error fetching weather data: {e}")
         return {
@@ -77,73 +91,112 @@ def encode_image(image_path):
         print(f"Error encoding image: {e}")
         return None
 
+def fetch_weather_stage(lat, lon):
+    """Weather stage of generate_gemini_insights; returns None without coordinates."""
+    if lat is None or lon is None:
+        return None
+    
+    try:
+        weather_data = get_weather_data(lat, lon)
+        print("Weather data fetched:", json.dumps(weather_data, indent=2))
+        return weather_data
+    except Exception as e:
+        print(f"Error fetching weather data: {str(e)}")
+        # Create basic weather data
+        return {
+            'temperature': 25,
+            'humidity': 70,
+            'precipitation': 0,
+            'wind_speed': 5,
+            'description': 'Weather data unavailable'
+        }
+
+def fetch_model_weather(lat, lon):
+    """AccuWeather readings for model_insights_stage; None without coordinates or an API key."""
+    if lat is None or lon is None:
+        return None
+    
+    try:
+        return get_field_weather(lat, lon)
+    except ValueError as e:
+        print(f"WARNING: {e}")
+        return None
+
+def model_insights_stage(processor, sensor_data, current_crop, lat, lon, weather_data=None):
+    """
+    Model inference stage of generate_gemini_insights.
+    
+    Pass weather_data from fetch_model_weather to score without fetching
+    weather; otherwise it is looked up for lat and lon.
+    """
+    if weather_data is not None:
+        insights = processor.generate_insights(sensor_data, weather_data=weather_data)
+    else:
+        insights = processor.generate_insights(sensor_data, lat, lon)
+    
+    # Add current crop to insights
+    insights['current_crop'] = current_crop
+    print(f"Current crop: {current_crop}")
+    return insights
+
 def generate_gemini_insights(current_crop, lat=None, lon=None, image_path=None, model_name="gemini-1.5-pro"):
     """Generate farming insights using the Gemini AI API."""
     print("\n=== STARTING GEMINI INSIGHTS GENERATION ===")
-    sensor_data = {
-        'N': 95,
-        'P': 52,
-        'K': 50,
-        'humidity': 70,
-        'soil_type': 'Clay'
-    }
+    sensor_data = dict(SENSOR_DATA)
     
     # Check API key availability
     if not GEMINI_API_KEY:
         print("ERROR: Cannot proceed with Gemini insights - API key not available")
         return create_fallback_output(sensor_data, current_crop, {}, None)
     
-    # Initialize the data processor
-    processor = FarmDataProcessor()
+    # Use the models this worker loaded at startup; they are trained offline
+    processor = model_registry.get_processor()
+    if processor is None:
+        print("Pre-trained models not available. Falling back to simplified insights generation")
+        return create_fallback_output(sensor_data, current_crop, {}, None)
+    
+    # Weather and model inference do not depend on each other, so they run
+    # concurrently; only the Gemini call below waits for both
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        weather_future = executor.submit(fetch_weather_stage, lat, lon)
+        insights_future = executor.submit(model_insights_stage, processor, sensor_data, current_crop, lat, lon)
+        weather_data = weather_future.result()
     
-    # Try to load pre-trained models with robust error handling
+    # Generate insights with error handling
     try:
-        models_loaded = processor.load_models("models/farm_data")
-    except (AttributeError, ImportError, Exception) as e:
-        print(f"Error loading models: {str(e)}")
-        print("Falling back to training new models")
-        models_loaded = False
-    
-    # Train new models if loading failed
-    if not models_loaded:
-        try:
-            print("Pre-trained models not found or incompatible. Training new models...")
-            df = load_example_data()
-            processor.create_preprocessor()
-            processor.fit_preprocessor(df)
-            processor.train_crop_yield_model(df, df['yield'])
-            processor.train_crop_recommendation_model(df, df['crop'])
-            processor.save_models("models/farm_data")
-        except Exception as e:
-            print(f"Error training new models: {str(e)}")
-            print("Falling back to simplified insights generation")
-            return create_fallback_output(sensor_data, current_crop, {}, None)
+        insights = insights_future.result()
+    except Exception as e:
+        print(f"Error generating insights: {str(e)}")
+        return create_fallback_output(sensor_data, current_crop, {}, weather_data)
     
-    # Get weather data if coordinates are provided
-    weather_data = None
-    if lat is not None and lon is not None:
-        try:
-            weather_data = get_weather_data(lat, lon)
-            print("Weather data fetched:", json.dumps(weather_data, indent=2))
-        except Exception as e:
-            print(f"Error fetching weather data: {str(e)}")
-            # Create basic weather data
-            weather_data = {
-                'temperature': 25,
-                'humidity': 70,
-                'precipitation': 0,
-                'wind_speed': 5,
-                'description': 'Weather data unavailable'
-            }
+    return synthesize_gemini_insights(current_crop, insights, weather_data, image_path, model_name, sensor_data)
+
+def synthesize_gemini_insights(current_crop, insights, weather_data, image_path=None,
+                               model_name="gemini-1.5-pro", sensor_data=None, fallback=True):
+    """
+    Gemini stage of generate_gemini_insights: turn model insights and weather into the stored recommendation.
+    
+    Falls back to create_fallback_output when the API key, the model insights
+    or a usable Gemini response is missing. With fallback=False it raises
+    GeminiFallback instead, or GeminiCallFailed if calling again may help, and
+    makes a single Gemini call so the caller can retry on its own schedule.
+    """
+    sensor_data = dict(sensor_data or SENSOR_DATA)
+    
+    def fall_back(reason, model_insights, error=GeminiFallback):
+        if not fallback:
+            raise error(reason)
+        return create_fallback_output(sensor_data, current_crop, model_insights, weather_data)
+    
+    if not GEMINI_API_KEY:
+        print("ERROR: Cannot proceed with Gemini insights - API key not available")
+        return fall_back("Gemini API key not available", {})
+    
+    if not insights:
+        print("Model insights not available. Falling back to simplified insights generation")
+        return fall_back("Model insights not available", {})
     
-    # Generate insights with error handling
     try:
-        insights = processor.generate_insights(sensor_data, lat, lon)
-        
-        # Add current crop to insights
-        insights['current_crop'] = current_crop
-        print(f"Current crop: {current_crop}")
-        
         # Add weather data to the insights if available
         if weather_data:
             insights['weather_data'] = weather_data
@@ -168,7 +221,7 @@ def generate_gemini_insights(current_crop, lat=None, lon=None, image_path=None,
         
     except Exception as e:
         print(f"Error generating insights: {str(e)}")
-        return create_fallback_output(sensor_data, current_crop, {}, weather_data)
+        return fall_back(f"Error generating insights: {str(e)}", {})
     
     # Continue with the rest of the function as before
     # Create a structured prompt for Gemini
@@ -291,7 +344,7 @@ Include advice about managing the current crop as well as recommendations for fu
         print(f"Successfully initialized Gemini model: {model_name}")
     except Exception as e:
         print(f"ERROR initializing Gemini model: {e}")
-        return create_fallback_output(sensor_data, current_crop, insights, weather_data)
+        return fall_back(f"Error initializing Gemini model: {e}", insights)
     
     # Configure the model to generate JSON responses
     generation_config = {
@@ -307,7 +360,7 @@ Include advice about managing the current crop as well as recommendations for fu
     gemini_json_response = {}
     
     try:
-        max_retries = 2
+        max_retries = 2 if fallback else 1
         retry_count = 0
         
         while retry_count < max_retries:
@@ -341,25 +394,31 @@ Include advice about managing the current crop as well as recommendations for fu
                         print(f"Retrying Gemini API call ({retry_count}/{max_retries})...")
                         time.sleep(2)
                     else:
-                        return create_fallback_output(sensor_data, current_crop, insights, weather_data)
+                        return fall_back("Invalid JSON response from Gemini", insights, GeminiCallFailed)
             
+            except GeminiFallback:
+                raise
             except Exception as e:
                 print(f"Error in Gemini API call: {e}")
                 retry_count += 1
                 if retry_count < max_retries:
                     print(f"Retrying Gemini API call ({retry_count}/{max_retries})...")
                     time.sleep(2)
+                elif isinstance(e, GEMINI_TRANSIENT_ERRORS):
+                    return fall_back(f"Error in Gemini API call: {e}", insights, GeminiCallFailed)
                 else:
-                    return create_fallback_output(sensor_data, current_crop, insights, weather_data)
+                    return fall_back(f"Error in Gemini API call: {e}", insights)
     
+    except GeminiFallback:
+        raise
     except Exception as e:
         print(f"ERROR calling Gemini API: {e}")
-        return create_fallback_output(sensor_data, current_crop, insights, weather_data)
+        return fall_back(f"Error calling Gemini API: {e}", insights)
     
     # Check if we have a valid response
     if not gemini_json_response or not isinstance(gemini_json_response, dict):
         print("WARNING: No valid JSON response received from Gemini API")
-        return create_fallback_output(sensor_data, current_crop, insights, weather_data)
+        return fall_back("No valid JSON response received from Gemini API", insights, GeminiCallFailed)
     
     # Add timestamp and other missing data
     if 'soil' not in gemini_json_response:
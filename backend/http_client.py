@@ -0,0 +1,215 @@
+"""
+Shared outbound HTTP clients
+
+Every external integration (weather APIs, Gemini) goes through one pooled
+client per process instead of opening a new connection per call, so TLS
+handshakes are paid once per host. Both clients apply:
+
+- keep-alive connection pooling (HTTP_MAX_CONNECTIONS in total)
+- at most HTTP_MAX_PER_HOST concurrent requests per host
+- connect and read timeouts (HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT)
+- up to HTTP_RETRIES retries of connection errors, timeouts, 429 and 5xx
+  responses, with full-jitter exponential backoff (or the server's
+  Retry-After) so failing callers do not retry in lockstep
+
+get_client() returns the sync client for this process and get_async_client()
+the asyncio client for the running event loop. Tests can route every
+request to a local handler with set_transport(httpx.MockTransport(handler)).
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+import httpx
+
+logger = logging.getLogger('http_client')
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", 8))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 3))
+
+# Backoff before retry n is uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 8))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _client_options(transport):
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS
+        ),
+        "transport": transport,
+    }
+
+
+def _backoff(attempt, response=None):
+    """Seconds to wait before retry number attempt (0-based)"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _host(url):
+    return urlsplit(str(url)).netloc
+
+
+class HttpClient:
+    """
+    Pooled synchronous client with per-host limits, timeouts and retries
+    """
+
+    def __init__(self, transport=None, retries=HTTP_RETRIES, max_per_host=HTTP_MAX_PER_HOST):
+        self.retries = retries
+        self.max_per_host = max_per_host
+        self._client = httpx.Client(**_client_options(transport))
+        self._host_slots = {}
+        self._slots_guard = threading.Lock()
+
+    def _slots(self, host):
+        with self._slots_guard:
+            return self._host_slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        Send a request, retrying transient failures
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            retries: Overrides the client's retry count for this request
+            **kwargs: Passed to httpx.Client.request (params, json, headers, ...)
+
+        Returns:
+            httpx.Response: The final response; call raise_for_status() to
+            turn an error status into an exception
+
+        Raises:
+            httpx.TransportError: If the last attempt could not connect or timed out
+        """
+        retries = self.retries if retries is None else retries
+        slots = self._slots(_host(url))
+
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                with slots:
+                    response = self._client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                response.close()
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"{method} {_host(url)} failed ({type(e).__name__}), retrying")
+
+            time.sleep(_backoff(attempt, response))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self._client.close()
+
+
+class AsyncHttpClient:
+    """
+    Pooled asyncio client with per-host limits, timeouts and retries
+
+    Bound to the event loop it is first used on; use get_async_client().
+    """
+
+    def __init__(self, transport=None, retries=HTTP_RETRIES, max_per_host=HTTP_MAX_PER_HOST):
+        self.retries = retries
+        self.max_per_host = max_per_host
+        self._client = httpx.AsyncClient(**_client_options(transport))
+        self._host_slots = {}
+
+    def _slots(self, host):
+        return self._host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+
+    async def request(self, method, url, retries=None, **kwargs):
+        """Async counterpart of HttpClient.request"""
+        retries = self.retries if retries is None else retries
+        slots = self._slots(_host(url))
+
+        for attempt in range(retries + 1):
+            response = None
+            try:
+                async with slots:
+                    response = await self._client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+                await response.aclose()
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"{method} {_host(url)} failed ({type(e).__name__}), retrying")
+
+            await asyncio.sleep(_backoff(attempt, response))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_transport = None
+_sync_client = None
+_sync_pid = None
+_async_clients = {}
+_lock = threading.Lock()
+
+
+def get_client():
+    """Return this process's shared HttpClient, creating a fresh one after a fork"""
+    global _sync_client, _sync_pid
+    with _lock:
+        # Pooled connections must not be shared with a forked child
+        if _sync_client is None or _sync_pid != os.getpid():
+            _sync_client = HttpClient(transport=_transport)
+            _sync_pid = os.getpid()
+        return _sync_client
+
+
+def get_async_client():
+    """Return the shared AsyncHttpClient of the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            # Drop clients of loops that have since been closed
+            for stale in [l for l in _async_clients if l.is_closed()]:
+                del _async_clients[stale]
+            client = _async_clients[loop] = AsyncHttpClient(transport=_transport)
+        return client
+
+
+def set_transport(transport):
+    """
+    Route all requests of new shared clients through transport, e.g. httpx.MockTransport
+
+    Pass None to go back to the network. Existing shared clients are discarded.
+    """
+    global _transport, _sync_client
+    with _lock:
+        _transport = transport
+        _sync_client = None
+        _async_clients.clear()
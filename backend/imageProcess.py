@@ -5,8 +5,19 @@ This file can be placed in the root directory for easier Celery integration
 import os
 import cv2
 import numpy as np
+import re
+import json
 import uuid
 import logging
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import tifffile
+from PIL import Image
+from image_cache import ResultCache, hash_file
+from vegetation_index import IndexAccumulator
+from field_zones import FieldZones, ZoneAccumulator
 
 # Configure logging
 logging.basicConfig(
@@ -32,6 +43,118 @@ except Exception as e:
     os.makedirs(RESULTS_DIR, exist_ok=True)
     logger.info(f"Using fallback results directory: {RESULTS_DIR}")
 
+# Images with more pixels than this are processed tile by tile
+TILED_PIXEL_THRESHOLD = int(os.getenv("TILED_PIXEL_THRESHOLD", 40_000_000))
+
+# Tile edge length for tiled processing (TIFF tiles must be a multiple of 16)
+DEFAULT_TILE_SIZE = 1024
+
+# Size of the square kernel used to clean up masks. An open followed by a
+# close erodes and dilates twice each, so a mask pixel depends on input
+# pixels up to four kernel radii away; tiles are read with that much overlap.
+MORPH_KERNEL_SIZE = 5
+MORPH_HALO = 4 * (MORPH_KERNEL_SIZE // 2)
+
+# Longest edge in pixels of the preview levels written with every analysis;
+# the full-resolution level is only rendered when it is first requested
+PYRAMID_LEVELS = {"thumbnail": 320, "screen": 1600}
+
+# Sidecar file recording how to render the full levels of an analysis
+RENDER_SPEC_SUFFIX = ".render.json"
+
+# Overlay colors (RGB) painted over the analysed regions
+HEALTHY_COLOR = (0, 255, 0)
+UNHEALTHY_COLOR = (255, 0, 0)
+SOIL_COLOR = (100, 100, 255)
+
+
+def _is_tiff(image_path):
+    return os.path.splitext(image_path)[1].lower() in ('.tif', '.tiff')
+
+
+def _pixel_count(image_path):
+    """
+    Read the image dimensions from its header without decoding pixel data
+    
+    Raises:
+        OSError: If the file is missing or not an image
+        ValueError: If a non-TIFF image is too large for Pillow to open
+    """
+    if _is_tiff(image_path):
+        with tifffile.TiffFile(image_path) as tif:
+            page = tif.pages[0]
+            return page.imagelength * page.imagewidth
+    
+    try:
+        with Image.open(image_path) as img:
+            return img.width * img.height
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"{image_path} is too large to decode whole; convert it to a tiled TIFF") from e
+
+
+class TileSource:
+    """
+    Read-only, region-addressable view of an image on disk
+
+    TIFF files (the usual orthomosaic format) are memory-mapped when stored
+    uncompressed, or opened as a chunked zarr store when compressed, so only
+    the regions being read are decoded. Other formats cannot be decoded by
+    region and are read whole with OpenCV, so they are refused above
+    TILED_PIXEL_THRESHOLD pixels: tiled processing then keeps its memory
+    ceiling for every input, and larger images must be converted to TIFF.
+    
+    Raises:
+        OSError: If a non-TIFF file is missing or not an image
+        ValueError: If the image cannot be decoded, or is a non-TIFF image
+            larger than TILED_PIXEL_THRESHOLD pixels
+    """
+
+    def __init__(self, image_path):
+        self._store = None
+        self._bgr = False
+
+        if _is_tiff(image_path):
+            try:
+                self._data = tifffile.memmap(image_path, mode='r')
+            except ValueError:
+                import zarr
+                self._store = tifffile.imread(image_path, aszarr=True, level=0)
+                self._data = zarr.open(self._store, mode='r')
+        else:
+            pixel_count = _pixel_count(image_path)
+            if pixel_count > TILED_PIXEL_THRESHOLD:
+                raise ValueError(
+                    f"{image_path} has {pixel_count} pixels, more than the {TILED_PIXEL_THRESHOLD} "
+                    "that can be decoded whole; convert it to a tiled TIFF"
+                )
+            self._data = cv2.imread(image_path)
+            self._bgr = True
+            if self._data is None:
+                raise ValueError(f"Could not read image: {image_path}")
+
+        self.height, self.width = self._data.shape[:2]
+
+    def read(self, y0, y1, x0, x1):
+        """Return the region [y0:y1, x0:x1] as a contiguous RGB uint8 array"""
+        region = np.asarray(self._data[y0:y1, x0:x1])
+
+        if region.dtype == np.uint16:
+            region = (region >> 8).astype(np.uint8)
+        elif region.dtype != np.uint8:
+            raise ValueError(f"Unsupported image dtype: {region.dtype}")
+
+        if region.ndim == 2:
+            return cv2.cvtColor(region, cv2.COLOR_GRAY2RGB)
+        if self._bgr:
+            return cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+        return np.ascontiguousarray(region[..., :3])
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+        self._data = None
+
+
 class ImageProcessor:
     """
     Class for processing farm images and generating analysis
@@ -45,20 +168,289 @@ class ImageProcessor:
         # Default parameters for soil detection
         self.soil_lower = np.array([0, 0, 0])
         self.soil_upper = np.array([30, 255, 200])
+        
+        # Broader range used to find anything that looks like vegetation
+        self.plant_lower = np.array([20, 30, 30])
+        self.plant_upper = np.array([100, 255, 255])
+        
+        self._kernel = np.ones((MORPH_KERNEL_SIZE, MORPH_KERNEL_SIZE), np.uint8)
+        
+        # Blending a pixel 50/50 with a fixed color only depends on the pixel
+        # value, so each overlay color is precomputed as a 256-entry table
+        self._tint_luts = {
+            color: self._make_tint_lut(color)
+            for color in (HEALTHY_COLOR, UNHEALTHY_COLOR, SOIL_COLOR)
+        }
+        
+        # Scratch arrays reused between calls, keyed by name. They are kept
+        # per thread so one processor can be shared by concurrent threads
+        self._local = threading.local()
+    
+    def cache_params(self):
+        """Return the thresholds that determine the analysis output, for cache keys"""
+        return {
+            "healthy_green": [self.healthy_green_lower.tolist(), self.healthy_green_upper.tolist()],
+            "plant": [self.plant_lower.tolist(), self.plant_upper.tolist()],
+            "soil": [self.soil_lower.tolist(), self.soil_upper.tolist()],
+            "morph_kernel_size": MORPH_KERNEL_SIZE,
+        }
+    
+    @classmethod
+    def from_cache_params(cls, params):
+        """Create a processor with the thresholds recorded by cache_params"""
+        processor = cls()
+        processor.healthy_green_lower, processor.healthy_green_upper = (np.array(v) for v in params["healthy_green"])
+        processor.plant_lower, processor.plant_upper = (np.array(v) for v in params["plant"])
+        processor.soil_lower, processor.soil_upper = (np.array(v) for v in params["soil"])
+        return processor
     
-    def process_image(self, image_path):
+    def process_image(self, image_path, metrics_only=False, vegetation_indices=False, field=None):
         """
         Process an image and generate health and soil analysis images
         
+        Only the thumbnail and screen levels of each overlay pyramid are
+        written; the full-resolution level is rendered by
+        render_full_overlay the first time it is requested.
+        
         Args:
             image_path: Path to the input image
+            metrics_only: Only compute the percentages, without rendering
+                or writing any images
+            vegetation_indices: Also summarise the ExG, VARI and GLI indices,
+                over the field pixels only when field is given
+            field: FieldZones to restrict the analysis to, with per-zone
+                statistics under "field"
             
         Returns:
             Dictionary with analysis results and paths to generated images
         """
         logger.info(f"Processing image: {image_path}")
         
-        # Load image
+        rgb_image, hsv_image = self._load_image(image_path)
+        
+        labels = field.labels(*rgb_image.shape[:2]) if field is not None else None
+        masks = self._field_masks(hsv_image, labels)
+        
+        summaries = {}
+        if vegetation_indices:
+            accumulator = IndexAccumulator()
+            accumulator.update_rows(rgb_image, labels)
+            summaries["vegetation_indices"] = accumulator.summary()
+        
+        if field is not None:
+            zones = ZoneAccumulator(field)
+            zones.update(labels, rgb_image, *masks[1:])
+            summaries["field"] = self._field_summary(field, zones)
+        
+        if metrics_only:
+            health_percentage, moisture_estimate = self._mask_statistics(rgb_image, *masks)
+            logger.info(f"Image metrics computed for: {image_path}")
+            return self._metrics_result(health_percentage, moisture_estimate, summaries)
+        
+        # Generate both visualizations in a single pass over the masks
+        health_img = self._buffer("health_viz", rgb_image.shape)
+        soil_img = self._buffer("soil_viz", rgb_image.shape)
+        health_percentage, moisture_estimate = self._analyze_fused(
+            rgb_image, masks, health_img, soil_img
+        )
+        
+        # Save the preview levels with error handling
+        analysis_id = str(uuid.uuid4())
+        health_pyramid, health_success = self._save_pyramid(
+            {"plant_health": health_img}, analysis_id, ".jpg"
+        )
+        soil_pyramid, soil_success = self._save_pyramid(
+            {"soil_analysis": soil_img}, analysis_id, ".jpg"
+        )
+        
+        return self._build_result(
+            image_path, analysis_id, health_percentage, moisture_estimate, summaries,
+            health_pyramid, health_success, soil_pyramid, soil_success, tiled=False, field=field
+        )
+    
+    def process_image_tiled(self, image_path, tile_size=DEFAULT_TILE_SIZE, metrics_only=False,
+                            vegetation_indices=False, field=None):
+        """
+        Process a large image tile by tile with bounded peak memory
+        
+        Tiles are read with an overlap of MORPH_HALO pixels so the mask
+        clean-up gives the same result as on the full frame, then cropped back
+        to the tile. Statistics are built from per-tile pixel counts and the
+        preview levels are assembled from downscaled tiles, so only a few
+        tiles are held in memory at any time regardless of the input size.
+        Only TIFF inputs are read by region; other formats are decoded whole
+        and refused above TILED_PIXEL_THRESHOLD pixels (see TileSource).
+        The full-resolution tiled TIFF overlays are rendered on demand.
+        
+        Args:
+            image_path: Path to the input image
+            tile_size: Tile edge length in pixels, a multiple of 16
+            metrics_only: Only compute the percentages, without rendering
+                or writing any images
+            vegetation_indices: Also summarise the ExG, VARI and GLI indices,
+                over the field pixels only when field is given
+            field: FieldZones to restrict the analysis to, with per-zone
+                statistics under "field"
+            
+        Returns:
+            Dictionary with analysis results and paths to generated images
+        """
+        if tile_size <= 0 or tile_size % 16:
+            raise ValueError(f"tile_size must be a positive multiple of 16, got {tile_size}")
+        
+        logger.info(f"Processing image in {tile_size}px tiles: {image_path}")
+        
+        source = TileSource(image_path)
+        try:
+            # Pixel counts for plant, unhealthy and soil masks, plus the RGB sum over soil
+            counts = np.zeros(3, dtype=np.int64)
+            soil_color_sum = np.zeros(3, dtype=np.float64)
+            accumulator = IndexAccumulator() if vegetation_indices else None
+            zones = ZoneAccumulator(field) if field is not None else None
+            
+            # Metrics-only runs never render, so they skip the preview canvases
+            if not metrics_only:
+                scale = min(1.0, PYRAMID_LEVELS["screen"] / max(source.height, source.width))
+                preview_shape = (max(1, round(source.height * scale)), max(1, round(source.width * scale)), 3)
+                health_preview = np.zeros(preview_shape, dtype=np.uint8)
+                soil_preview = np.zeros(preview_shape, dtype=np.uint8)
+            
+            for y, x, (rgb, healthy, plant, unhealthy, soil), labels in self._iter_tile_masks(
+                source, tile_size, field
+            ):
+                counts[0] += cv2.countNonZero(plant)
+                counts[1] += cv2.countNonZero(unhealthy)
+                counts[2] += cv2.countNonZero(soil)
+                soil_color_sum += rgb[soil > 0].sum(axis=0)
+                
+                if accumulator is not None:
+                    accumulator.update(rgb, labels)
+                if zones is not None:
+                    zones.update(labels, rgb, plant, unhealthy, soil)
+                
+                if metrics_only:
+                    continue
+                
+                # Paste the downscaled tile into the preview canvas
+                py0, py1 = round(y * scale), round((y + rgb.shape[0]) * scale)
+                px0, px1 = round(x * scale), round((x + rgb.shape[1]) * scale)
+                if py1 <= py0 or px1 <= px0:
+                    continue
+                
+                for masks, preview in (
+                    ([(healthy, HEALTHY_COLOR), (unhealthy, UNHEALTHY_COLOR)], health_preview),
+                    ([(soil, SOIL_COLOR)], soil_preview),
+                ):
+                    viz = np.empty_like(rgb)
+                    self._render_overlay(rgb, masks, viz)
+                    preview[py0:py1, px0:px1] = cv2.resize(viz, (px1 - px0, py1 - py0), interpolation=cv2.INTER_AREA)
+        finally:
+            source.close()
+        
+        total_plant_pixels, unhealthy_pixels, soil_pixels = (int(c) for c in counts)
+        
+        if total_plant_pixels == 0:  # No plants detected
+            health_percentage = 0
+        else:
+            health_percentage = 100 - (unhealthy_pixels / total_plant_pixels * 100)
+        
+        if soil_pixels > 0:
+            avg_color = (soil_color_sum / soil_pixels).astype(int)
+            brightness = np.mean(avg_color)
+            moisture_estimate = 100 - (brightness / 255 * 100)
+        else:
+            moisture_estimate = 0
+        
+        summaries = {}
+        if accumulator is not None:
+            summaries["vegetation_indices"] = accumulator.summary()
+        if zones is not None:
+            summaries["field"] = self._field_summary(field, zones)
+        
+        if metrics_only:
+            logger.info(f"Image metrics computed for: {image_path}")
+            return self._metrics_result(health_percentage, moisture_estimate, summaries)
+        
+        analysis_id = str(uuid.uuid4())
+        health_pyramid, health_success = self._save_pyramid(
+            {"plant_health": health_preview}, analysis_id, ".tif"
+        )
+        soil_pyramid, soil_success = self._save_pyramid(
+            {"soil_analysis": soil_preview}, analysis_id, ".tif"
+        )
+        
+        return self._build_result(
+            image_path, analysis_id, health_percentage, moisture_estimate, summaries,
+            health_pyramid, health_success, soil_pyramid, soil_success,
+            tiled=True, tile_size=tile_size, field=field
+        )
+    
+    def render_full_levels(self, spec):
+        """
+        Write the full-resolution overlays described by a render spec
+        
+        Both overlays come out of the same analysis pass, so both are written
+        whichever one was requested. Files are written under a temporary name
+        and moved into place so concurrent requests never see a partial image.
+        Each render uses its own temporary names, so concurrent renders of the
+        same overlays do not write into each other's files.
+        
+        Returns:
+            bool: True if both overlays were written
+        """
+        health_path = spec["full"]["plant_health"]
+        soil_path = spec["full"]["soil_analysis"]
+        health_tmp = _partial_path(health_path)
+        soil_tmp = _partial_path(soil_path)
+        field = FieldZones.from_params(spec["field"]) if spec.get("field") else None
+        
+        try:
+            success = self._render_full_levels(spec, field, health_tmp, soil_tmp)
+            if success:
+                os.replace(health_tmp, health_path)
+                os.replace(soil_tmp, soil_path)
+            return success
+        finally:
+            for path in (health_tmp, soil_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _render_full_levels(self, spec, field, health_tmp, soil_tmp):
+        """Write both full-resolution overlays of a render spec to the given paths"""
+        image_path = spec["image_path"]
+        if spec["tiled"]:
+            tile_size = spec["tile_size"]
+            source = TileSource(image_path)
+            try:
+                def overlay_tiles(select):
+                    for _, _, (rgb, healthy, _, unhealthy, soil), _ in self._iter_tile_masks(
+                        source, tile_size, field
+                    ):
+                        viz = np.empty_like(rgb)
+                        self._render_overlay(rgb, select(healthy, unhealthy, soil), viz)
+                        yield self._pad_tile(viz, tile_size)
+                
+                success = self._write_tiled(
+                    overlay_tiles(lambda h, u, s: [(h, HEALTHY_COLOR), (u, UNHEALTHY_COLOR)]),
+                    health_tmp, source, tile_size
+                ) and self._write_tiled(
+                    overlay_tiles(lambda h, u, s: [(s, SOIL_COLOR)]),
+                    soil_tmp, source, tile_size
+                )
+            finally:
+                source.close()
+        else:
+            rgb_image, hsv_image = self._load_image(image_path)
+            labels = field.labels(*rgb_image.shape[:2]) if field is not None else None
+            health_img = self._buffer("health_viz", rgb_image.shape)
+            soil_img = self._buffer("soil_viz", rgb_image.shape)
+            self._analyze_fused(rgb_image, self._field_masks(hsv_image, labels), health_img, soil_img)
+            success = self._save_image(health_img, health_tmp) and self._save_image(soil_img, soil_tmp)
+        
+        return success
+    
+    def _load_image(self, image_path):
+        """Read an image into the reusable RGB and HSV buffers"""
         img = cv2.imread(image_path)
         if img is None:
             error_msg = f"Could not read image: {image_path}"
@@ -66,48 +458,299 @@ class ImageProcessor:
             raise ValueError(error_msg)
             
         # Convert to RGB (from BGR)
-        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self._buffer("rgb", img.shape))
             
         # Convert to HSV for better color analysis
-        hsv_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2HSV)
-        
-        # Generate unique filenames for the output images
-        health_image_name = f"{str(uuid.uuid4())}_plant_health.jpg"
-        soil_image_name = f"{str(uuid.uuid4())}_soil_analysis.jpg"
+        hsv_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2HSV, dst=self._buffer("hsv", img.shape))
         
-        health_image_path = os.path.join(RESULTS_DIR, health_image_name)
-        soil_image_path = os.path.join(RESULTS_DIR, soil_image_name)
-        
-        # Generate plant health visualization
-        health_img, health_percentage = self._detect_plant_health(rgb_image, hsv_image)
+        return rgb_image, hsv_image
+    
+    def _save_pyramid(self, overlay, analysis_id, full_extension):
+        """
+        Write the thumbnail and screen levels of an overlay
         
-        # Generate soil analysis visualization
-        soil_img, moisture_estimate = self._analyze_soil(rgb_image, hsv_image)
+        Args:
+            overlay: {kind: RGB image} for a single overlay kind
+            analysis_id: Identifier shared by all outputs of one analysis
+            full_extension: Extension of the (not yet rendered) full level
+            
+        Returns:
+            tuple: ({level: path} including the pending full level, success)
+        """
+        (kind, rgb_image), = overlay.items()
+        pyramid = {"full": os.path.join(RESULTS_DIR, f"{analysis_id}_{kind}{full_extension}")}
+        success = True
         
-        # Save the visualizations with error handling
-        health_success = self._save_image(health_img, health_image_path)
-        soil_success = self._save_image(soil_img, soil_image_path)
+        # Each level is downscaled from the previous, larger one
+        level_image = rgb_image
+        for level, max_edge in sorted(PYRAMID_LEVELS.items(), key=lambda item: -item[1]):
+            height, width = level_image.shape[:2]
+            scale = max_edge / max(height, width)
+            if scale < 1:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                level_image = cv2.resize(level_image, size, interpolation=cv2.INTER_AREA)
+            
+            level_path = os.path.join(RESULTS_DIR, f"{analysis_id}_{kind}_{level}.jpg")
+            if self._save_image(level_image, level_path):
+                pyramid[level] = level_path
+            else:
+                success = False
         
-        # Return basic results with file paths
+        return pyramid, success
+    
+    @staticmethod
+    def _metrics_result(health_percentage, moisture_estimate, summaries=None):
+        """Return the percentages plus any optional summaries (vegetation_indices, field)"""
         result = {
             "plant_health_percentage": round(health_percentage, 2),
             "estimated_soil_moisture": round(moisture_estimate, 2),
         }
+        result.update(summaries or {})
+        return result
+    
+    @staticmethod
+    def _field_summary(field, zones):
+        zone_stats = zones.zones()
+        return {
+            "pixel_count": sum(zone["pixel_count"] for zone in zone_stats),
+            "zone_grid": list(field.zone_grid),
+            "zones": zone_stats,
+        }
+    
+    def _build_result(self, image_path, analysis_id, health_percentage, moisture_estimate, summaries,
+                      health_pyramid, health_success, soil_pyramid, soil_success, tiled, tile_size=None,
+                      field=None):
+        """Record how to render the full levels and assemble the result dictionary"""
+        spec_path = os.path.join(RESULTS_DIR, f"{analysis_id}{RENDER_SPEC_SUFFIX}")
+        spec = {
+            "image_path": os.path.abspath(image_path),
+            "params": self.cache_params(),
+            "tiled": tiled,
+            "tile_size": tile_size,
+            "field": field.params() if field is not None else None,
+            "full": {"plant_health": health_pyramid["full"], "soil_analysis": soil_pyramid["full"]},
+        }
+        with open(spec_path, 'w') as f:
+            json.dump(spec, f)
+        
+        # Return basic results with file paths
+        result = self._metrics_result(health_percentage, moisture_estimate, summaries)
+        result.update({
+            "plant_health_pyramid": health_pyramid,
+            "soil_analysis_pyramid": soil_pyramid,
+            "render_spec": spec_path,
+        })
         
-        # Only include image paths if saving was successful
+        # Only include image paths if saving was successful; the screen level
+        # is what the dashboard displays
         if health_success:
-            result["plant_health_image"] = health_image_path
+            result["plant_health_image"] = health_pyramid["screen"]
         else:
             logger.warning("Failed to save plant health image")
             
         if soil_success:
-            result["soil_analysis_image"] = soil_image_path
+            result["soil_analysis_image"] = soil_pyramid["screen"]
         else:
             logger.warning("Failed to save soil analysis image")
-            
+        
         logger.info(f"Image processing completed for: {image_path}")
         return result
     
+    def _iter_tile_masks(self, source, tile_size, field=None):
+        """
+        Yield (y, x, (rgb, healthy, plant, unhealthy, soil), labels) for each tile in row-major order
+        
+        Each tile is read with MORPH_HALO pixels of context on every side that
+        lies inside the image, and all arrays are cropped back to the tile.
+        With a field, the masks are restricted to it and labels holds the
+        tile's zone labels; otherwise labels is None.
+        """
+        for y in range(0, source.height, tile_size):
+            for x in range(0, source.width, tile_size):
+                y0, x0 = max(y - MORPH_HALO, 0), max(x - MORPH_HALO, 0)
+                y1 = min(y + tile_size + MORPH_HALO, source.height)
+                x1 = min(x + tile_size + MORPH_HALO, source.width)
+                
+                rgb = source.read(y0, y1, x0, x1)
+                hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+                masks = self._compute_masks(hsv)
+                
+                core = (
+                    slice(y - y0, min(y + tile_size, source.height) - y0),
+                    slice(x - x0, min(x + tile_size, source.width) - x0),
+                )
+                rgb, *masks = (np.ascontiguousarray(a[core]) for a in (rgb,) + masks)
+                
+                labels = None
+                if field is not None:
+                    labels = field.labels(
+                        source.height, source.width, y, y + rgb.shape[0], x, x + rgb.shape[1]
+                    )
+                    self._restrict_to_field(masks, labels)
+                yield y, x, (rgb, *masks), labels
+    
+    def _analyze_fused(self, rgb_image, masks, health_viz, soil_viz):
+        """
+        Compute plant health and soil moisture and render both overlays in one pass
+        
+        Equivalent to _detect_plant_health followed by _analyze_soil, which are
+        kept as the reference implementation, but the masks share scratch
+        buffers and the overlays are written into the preallocated
+        health_viz and soil_viz arrays.
+        
+        Args:
+            masks: The four masks returned by _field_masks
+        
+        Returns:
+            tuple: (health_percentage, moisture_estimate)
+        """
+        healthy_mask, general_plant_mask, unhealthy_mask, soil_mask = masks
+        
+        health_percentage, moisture_estimate = self._mask_statistics(
+            rgb_image, healthy_mask, general_plant_mask, unhealthy_mask, soil_mask
+        )
+        
+        self._render_overlay(
+            rgb_image, [(healthy_mask, HEALTHY_COLOR), (unhealthy_mask, UNHEALTHY_COLOR)], health_viz
+        )
+        self._render_overlay(rgb_image, [(soil_mask, SOIL_COLOR)], soil_viz)
+        
+        return health_percentage, moisture_estimate
+    
+    def _mask_statistics(self, rgb_image, healthy_mask, general_plant_mask, unhealthy_mask, soil_mask):
+        """
+        Compute plant health and soil moisture from the analysis masks
+        
+        Returns:
+            tuple: (health_percentage, moisture_estimate)
+        """
+        # Calculate health percentage
+        total_plant_pixels = cv2.countNonZero(general_plant_mask)
+        if total_plant_pixels == 0:  # No plants detected
+            health_percentage = 0
+        else:
+            unhealthy_pixels = cv2.countNonZero(unhealthy_mask)
+            health_percentage = 100 - (unhealthy_pixels / total_plant_pixels * 100)
+        
+        # Simple moisture estimate based on the darkness of the average soil color
+        if cv2.countNonZero(soil_mask) > 0:
+            avg_color = np.array(cv2.mean(rgb_image, mask=soil_mask)[:3]).astype(int)
+            brightness = np.mean(avg_color)
+            moisture_estimate = 100 - (brightness / 255 * 100)
+        else:
+            moisture_estimate = 0
+        
+        return health_percentage, moisture_estimate
+    
+    def _compute_masks(self, hsv_image):
+        """
+        Return the healthy, general plant, unhealthy and soil masks for an HSV image
+        
+        The masks are written into scratch buffers owned by this instance and
+        are overwritten by the next call with an image of the same size.
+        """
+        shape = hsv_image.shape[:2]
+        healthy_mask = self._buffer("healthy", shape)
+        general_plant_mask = self._buffer("plant", shape)
+        unhealthy_mask = self._buffer("unhealthy", shape)
+        soil_mask = self._buffer("soil", shape)
+        
+        cv2.inRange(hsv_image, self.healthy_green_lower, self.healthy_green_upper, dst=healthy_mask)
+        cv2.inRange(hsv_image, self.plant_lower, self.plant_upper, dst=general_plant_mask)
+        cv2.inRange(hsv_image, self.soil_lower, self.soil_upper, dst=soil_mask)
+        
+        # Clean up the plant and soil masks
+        for mask in (general_plant_mask, soil_mask):
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel, dst=mask)
+            cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel, dst=mask)
+        
+        # Unhealthy plants are plants outside the healthy green range
+        cv2.bitwise_not(healthy_mask, dst=unhealthy_mask)
+        cv2.bitwise_and(general_plant_mask, unhealthy_mask, dst=unhealthy_mask)
+        
+        return healthy_mask, general_plant_mask, unhealthy_mask, soil_mask
+    
+    def _field_masks(self, hsv_image, labels=None):
+        """Return the _compute_masks masks, restricted to the field if zone labels are given"""
+        masks = self._compute_masks(hsv_image)
+        if labels is not None:
+            self._restrict_to_field(masks, labels)
+        return masks
+    
+    def _restrict_to_field(self, masks, labels):
+        """Clear every mask, in place, outside the field (label 0)"""
+        inside = cv2.compare(labels, 0, cv2.CMP_GT)
+        for mask in masks:
+            cv2.bitwise_and(mask, inside, dst=mask)
+    
+    def _render_overlay(self, rgb_image, colored_masks, out):
+        """
+        Write the image into out with each (mask, color) region blended 50/50 with its color
+        
+        Matches painting the colors onto a copy and blending it with
+        cv2.addWeighted, but only touches the masked pixels.
+        """
+        tint = self._buffer("tint", rgb_image.shape)
+        np.copyto(out, rgb_image)
+        for mask, color in colored_masks:
+            cv2.LUT(rgb_image, self._tint_luts[color], dst=tint)
+            cv2.copyTo(tint, mask, out)
+    
+    def _buffer(self, name, shape):
+        """Return a reusable uint8 scratch array of the given shape, private to the calling thread"""
+        buffers = self._local.__dict__.setdefault("buffers", {})
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape):
+            buffer = np.empty(shape, dtype=np.uint8)
+            buffers[name] = buffer
+        return buffer
+    
+    @staticmethod
+    def _make_tint_lut(color):
+        """Build a (1, 256, 3) lookup table of every channel value blended 50/50 with color"""
+        values = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)[None]
+        overlay = np.empty_like(values)
+        overlay[:] = color
+        return cv2.addWeighted(overlay, 0.5, values, 0.5, 0)
+    
+    @staticmethod
+    def _pad_tile(tile, tile_size):
+        """Zero-pad an edge tile to the full tile shape expected by the TIFF writer"""
+        pad_y, pad_x = tile_size - tile.shape[0], tile_size - tile.shape[1]
+        if pad_y or pad_x:
+            tile = np.pad(tile, ((0, pad_y), (0, pad_x), (0, 0)))
+        return tile
+    
+    def _write_tiled(self, tiles, output_path, source, tile_size):
+        """
+        Stream RGB tiles in row-major order into a tiled TIFF
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            tifffile.imwrite(
+                output_path,
+                tiles,
+                shape=(source.height, source.width, 3),
+                dtype=np.uint8,
+                tile=(tile_size, tile_size),
+                photometric='rgb',
+                compression='zlib'
+            )
+            
+            if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+                logger.info(f"Successfully saved image to: {output_path}")
+                return True
+            else:
+                logger.error(f"Failed to save image to: {output_path}")
+                return False
+                
+        except Exception as e:
+            logger.error(f"Error saving image to {output_path}: {str(e)}")
+            return False
+    
     def _save_image(self, rgb_image, output_path):
         """
         Convert RGB image to BGR and save to disk with verification
@@ -219,8 +862,134 @@ class ImageProcessor:
 # Create a single instance of the image processor
 image_processor = ImageProcessor()
 
-def process_image_sync(image_path):
-    """Synchronous function to process an image - can be called from Celery"""
+# Results keyed on image content and processor thresholds
+result_cache = ResultCache()
+
+# File name of the full-resolution level of an overlay pyramid
+_FULL_LEVEL_NAME = re.compile(r"([0-9a-f-]{36})_(plant_health|soil_analysis)\.(jpg|tif)")
+
+def _partial_path(path):
+    """Unique temporary name, with the same extension, to write a file under before moving it into place"""
+    base, extension = os.path.splitext(path)
+    return f"{base}.{uuid.uuid4().hex}.partial{extension}"
+
+def render_full_overlay(image_name):
+    """
+    Render the full-resolution level of an overlay the first time it is requested
+    
+    Args:
+        image_name: File name of the full level inside RESULTS_DIR
+        
+    Returns:
+        str or None: Path to the rendered image, or None if the name is not
+        the full level of a known analysis
+    """
+    match = _FULL_LEVEL_NAME.fullmatch(os.path.basename(image_name))
+    if not match:
+        return None
+    
+    image_path = os.path.join(RESULTS_DIR, match.group(0))
+    if os.path.exists(image_path):
+        return image_path
+    
+    spec_path = os.path.join(RESULTS_DIR, f"{match.group(1)}{RENDER_SPEC_SUFFIX}")
+    if not os.path.exists(spec_path):
+        return None
+    
+    with open(spec_path) as f:
+        spec = json.load(f)
+    
+    logger.info(f"Rendering full-resolution overlays for: {spec['image_path']}")
+    try:
+        # A dedicated processor, since requests may render concurrently
+        processor = ImageProcessor.from_cache_params(spec["params"])
+        rendered = processor.render_full_levels(spec)
+    except Exception as e:
+        logger.error(f"Error rendering full-resolution overlay {image_name}: {str(e)}", exc_info=True)
+        rendered = False
+    
+    if rendered:
+        # Count the new files against the cache's size limit
+        result_cache.update_rendered(spec_path)
+    
+    # A concurrent request may have rendered it first
+    if rendered or os.path.exists(image_path):
+        return image_path
+    return None
+
+def _analyze_with_cache(processor, absolute_path, tiled, tile_size, use_cache,
+                        metrics_only=False, vegetation_indices=False, field=None, pixel_count=None,
+                        content_hash=None):
+    """Return the cached analysis of an image, or run the processor and cache its result"""
+    key = None
+    if use_cache:
+        content_hash = content_hash or hash_file(absolute_path)
+        params = dict(
+            processor.cache_params(),
+            vegetation_indices=vegetation_indices,
+            field=field.params() if field is not None else None,
+        )
+        key = result_cache.key_for(content_hash, dict(params, metrics_only=metrics_only))
+        
+        # A full analysis also answers a metrics-only request
+        lookups = [key]
+        if metrics_only:
+            lookups.insert(0, result_cache.key_for(content_hash, dict(params, metrics_only=False)))
+        
+        for lookup in lookups:
+            cached = result_cache.get(lookup)
+            if cached is not None:
+                if metrics_only:
+                    return processor._metrics_result(
+                        cached["plant_health_percentage"], cached["estimated_soil_moisture"],
+                        {k: cached[k] for k in ("vegetation_indices", "field") if k in cached}
+                    )
+                return cached
+    
+    if tiled is None:
+        if pixel_count is None:
+            pixel_count = _pixel_count(absolute_path)
+        tiled = pixel_count > TILED_PIXEL_THRESHOLD
+    
+    if tiled:
+        results = processor.process_image_tiled(
+            absolute_path, tile_size, metrics_only=metrics_only,
+            vegetation_indices=vegetation_indices, field=field
+        )
+    else:
+        results = processor.process_image(
+            absolute_path, metrics_only=metrics_only, vegetation_indices=vegetation_indices, field=field
+        )
+    
+    if key is not None:
+        result_cache.put(key, results)
+    return results
+
+def process_image_sync(image_path, tiled=None, tile_size=DEFAULT_TILE_SIZE, use_cache=True,
+                       metrics_only=False, vegetation_indices=False, field_coordinates=None,
+                       zone_grid=None, content_hash=None):
+    """
+    Synchronous function to process an image - can be called from Celery
+    
+    Args:
+        image_path: Path to the input image
+        tiled: Force tiled (True) or whole-frame (False) processing; by default
+            images larger than TILED_PIXEL_THRESHOLD pixels are tiled, which
+            fails for non-TIFF images since they cannot be read by region
+        tile_size: Tile edge length used in tiled mode
+        use_cache: Return a stored result for identical image content and
+            thresholds instead of reprocessing
+        metrics_only: Only return plant_health_percentage and
+            estimated_soil_moisture, skipping all visualization and disk I/O
+        vegetation_indices: Add histogram and percentile summaries of the
+            ExG, VARI and GLI indices under "vegetation_indices"
+        field_coordinates: Field boundary (land.coordinates) of the map
+            snapshot; pixels outside it are left out of every statistic
+        zone_grid: (rows, cols) of management zones to split the field into,
+            reported under "field"; requires field_coordinates
+        content_hash: SHA-256 of the image if already known (e.g. computed
+            while the upload was streamed), to skip hashing it again
+    """
     
     absolute_path = os.path.abspath(image_path)
     logger.info(f"Processing request for image: {absolute_path}")
@@ -230,9 +999,14 @@ def process_image_sync(image_path):
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     
+    field = FieldZones(field_coordinates, zone_grid) if field_coordinates else None
+    
     try:
         # Process the image
-        results = image_processor.process_image(absolute_path)
+        results = _analyze_with_cache(
+            image_processor, absolute_path, tiled, tile_size, use_cache, metrics_only,
+            vegetation_indices, field, content_hash=content_hash
+        )
         
         # Verify the output images exist
         missing_files = []
@@ -247,4 +1021,122 @@ def process_image_sync(image_path):
         return results
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+def _batch_worker_init():
+    """Create the ImageProcessor this pool worker reuses for all of its frames"""
+    global image_processor
+    image_processor = ImageProcessor()
+
+def _process_batch_frame(image_path, tiled, use_cache, metrics_only, vegetation_indices=False):
+    """Process one frame of a batch; failures are reported in the result instead of raised"""
+    try:
+        absolute_path = os.path.abspath(image_path)
+        if not os.path.exists(absolute_path):
+            raise FileNotFoundError(f"Image file not found: {absolute_path}")
+        
+        pixel_count = _pixel_count(absolute_path)
+        result = dict(_analyze_with_cache(
+            image_processor, absolute_path, tiled, DEFAULT_TILE_SIZE, use_cache, metrics_only,
+            vegetation_indices, pixel_count=pixel_count
+        ))
+        result.update({"image_path": image_path, "status": "Success", "pixel_count": pixel_count})
+        return result
+    except Exception as e:
+        logger.error(f"Error processing batch frame {image_path}: {str(e)}")
+        return {"image_path": image_path, "status": "Failed", "message": str(e)}
+
+def process_batch_frames(image_paths, tiled=None, use_cache=True, metrics_only=False,
+                         vegetation_indices=False):
+    """
+    Process frames of a batch one after another in this process
+    
+    This is the unit of work of a batch spread over Celery tasks; combine
+    the frames of all parts with aggregate_batch.
+    
+    Args:
+        image_paths: Paths to the input images
+        tiled: Passed through to each frame as in process_image_sync
+        use_cache: Passed through to each frame as in process_image_sync
+        metrics_only: Passed through to each frame as in process_image_sync
+        vegetation_indices: Passed through to each frame as in process_image_sync
+        
+    Returns:
+        list: Per-frame results in input order; a frame that fails has
+        status "Failed" and a message instead of raising
+    """
+    return [
+        _process_batch_frame(image_path, tiled, use_cache, metrics_only, vegetation_indices)
+        for image_path in image_paths
+    ]
+
+def aggregate_batch(frames):
+    """
+    Combine per-frame results into a pixel-area weighted aggregate
+    
+    Args:
+        frames: Frame results as returned by process_batch_frames
+        
+    Returns:
+        dict: Frame and failure counts and the weighted plant health and
+        soil moisture, None if no frame succeeded
+    """
+    succeeded = [f for f in frames if f["status"] == "Success" and f["pixel_count"]]
+    total_area = sum(f["pixel_count"] for f in succeeded)
+    
+    aggregate = {
+        "frame_count": len(frames),
+        "failed_count": sum(1 for f in frames if f["status"] != "Success"),
+        "plant_health_percentage": None,
+        "estimated_soil_moisture": None,
+    }
+    if total_area:
+        for key in ("plant_health_percentage", "estimated_soil_moisture"):
+            weighted = sum(f[key] * f["pixel_count"] for f in succeeded) / total_area
+            aggregate[key] = round(float(weighted), 2)
+    return aggregate
+
+def process_images_batch(image_paths, workers=None, tiled=None, use_cache=True, metrics_only=False,
+                         vegetation_indices=False):
+    """
+    Process a batch of images (e.g. every frame of a drone flight) in parallel
+    
+    Frames are spread over a process pool in which every worker reuses a
+    single ImageProcessor. This is for standalone use; Celery workers fan a
+    batch out as tasks instead (see process_task.process_image_batch),
+    since a prefork child is daemonic and may not start a pool. Called from
+    a daemonic process, the frames are processed serially with a warning.
+    
+    Args:
+        image_paths: Paths to the input images
+        workers: Number of pool workers, defaults to the number of CPUs
+        tiled: Passed through to each frame as in process_image_sync
+        use_cache: Passed through to each frame as in process_image_sync
+        metrics_only: Passed through to each frame as in process_image_sync
+        vegetation_indices: Passed through to each frame as in process_image_sync
+        
+    Returns:
+        Dictionary with per-frame results in input order and a pixel-area
+        weighted aggregate of plant health and soil moisture
+    """
+    image_paths = list(image_paths)
+    
+    if multiprocessing.current_process().daemon:
+        logger.warning(
+            f"Daemonic process cannot start a pool; processing {len(image_paths)} images serially. "
+            "Use the process_image_batch task to spread a batch over Celery workers."
+        )
+        frames = process_batch_frames(image_paths, tiled, use_cache, metrics_only, vegetation_indices)
+    else:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(image_paths) or 1))
+        logger.info(f"Processing batch of {len(image_paths)} images with {workers} workers")
+        process_frame = partial(
+            _process_batch_frame, tiled=tiled, use_cache=use_cache, metrics_only=metrics_only,
+            vegetation_indices=vegetation_indices
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init) as executor:
+            frames = list(executor.map(process_frame, image_paths))
+    
+    aggregate = aggregate_batch(frames)
+    logger.info(f"Batch processing completed: {aggregate}")
+    return {"frames": frames, "aggregate": aggregate}
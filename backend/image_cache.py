@@ -0,0 +1,217 @@
+"""
+Content-addressed cache for image analysis results
+
+Results are keyed on a hash of the image bytes plus the analysis parameters,
+so re-analysing the same upload returns the stored percentages and the
+overlay images that were already written instead of recomputing them. The
+index lives in a SQLite file so every worker process shares it, and overlay
+files are evicted least recently used first once the cache grows past its
+size limit.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger('image_cache')
+
+# Index location. It must be shared by every API and worker container, like
+# the results it indexes, but stay out of the results directory, which is
+# served statically; docker compose mounts the shared ./cache volume here.
+DEFAULT_INDEX_PATH = os.getenv("RESULTS_CACHE_INDEX", os.path.join("cache", "analysis_cache.sqlite3"))
+
+# Upper bound on the total size of cached overlay images
+DEFAULT_MAX_BYTES = int(os.getenv("RESULTS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def required_files(result):
+    """Return the paths of the images a cached result cannot be served without"""
+    return [value for key, value in result.items() if key.endswith("_image")]
+
+
+def result_files(result):
+    """Return the paths of every file written for an analysis result"""
+    paths = set(required_files(result))
+    for key, value in result.items():
+        if key.endswith("_pyramid"):
+            paths.update(value.values())
+    if "render_spec" in result:
+        paths.add(result["render_spec"])
+    return sorted(paths)
+
+
+def _files_size(result):
+    return sum(os.path.getsize(path) for path in result_files(result) if os.path.exists(path))
+
+
+class ResultCache:
+    """
+    LRU cache of analysis results and their overlay images
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            # Entry of each render spec, to count the levels it renders later
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS render_specs (
+                    spec TEXT PRIMARY KEY,
+                    key TEXT NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the cache safe to use from
+        # forked pool workers and threads
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key_for(self, content_hash, params):
+        """
+        Build the cache key for an image and the parameters it is analysed with
+
+        Args:
+            content_hash: hash_file digest of the input image
+            params: JSON-serialisable analysis parameters
+
+        Returns:
+            str: Hex digest identifying the image content and parameters
+        """
+        digest = hashlib.sha256(content_hash.encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached result, refreshing its position in the LRU order
+
+        Entries whose image files have disappeared are dropped and reported
+        as a miss.
+
+        Returns:
+            dict or None: The cached result
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            result = json.loads(row[0])
+            if not all(os.path.exists(path) for path in required_files(result)):
+                logger.warning(f"Cached images missing for {key}, discarding entry")
+                self._delete(conn, key)
+                return None
+
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        logger.info(f"Analysis cache hit: {key}")
+        return result
+
+    def put(self, key, result):
+        """
+        Store a result and evict old entries if the cache is over its size limit
+
+        Full-resolution levels rendered later on demand are counted once
+        update_rendered is called for the result's render spec.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, result, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), _files_size(result), time.time())
+            )
+            if "render_spec" in result:
+                conn.execute(
+                    "INSERT OR REPLACE INTO render_specs (spec, key) VALUES (?, ?)",
+                    (result["render_spec"], key)
+                )
+            self._evict(conn, keep=key)
+
+    def update_rendered(self, render_spec):
+        """
+        Recount the size of the entry owning render_spec after its full levels
+        were rendered, and evict old entries if that puts the cache over its limit
+
+        Args:
+            render_spec: Path of the render spec recorded in the cached result
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT entries.key, entries.result FROM render_specs "
+                "JOIN entries ON entries.key = render_specs.key WHERE render_specs.spec = ?",
+                (render_spec,)
+            ).fetchone()
+            if row is None:
+                return
+
+            key, result = row
+            conn.execute(
+                "UPDATE entries SET size = ?, last_access = ? WHERE key = ?",
+                (_files_size(json.loads(result)), time.time(), key)
+            )
+            self._evict(conn, keep=key)
+
+    def _delete(self, conn, key):
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.execute("DELETE FROM render_specs WHERE key = ?", (key,))
+
+    def _evict(self, conn, keep):
+        """Delete least recently used entries and their files until under max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = conn.execute(
+            "SELECT key, result, size FROM entries WHERE key != ? ORDER BY last_access",
+            (keep,)
+        ).fetchall()
+
+        for key, result, size in rows:
+            if total <= self.max_bytes:
+                break
+
+            for path in result_files(json.loads(result)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Error evicting cached image {path}: {str(e)}")
+
+            self._delete(conn, key)
+            total -= size
+            logger.info(f"Evicted cached analysis {key} ({size} bytes)")
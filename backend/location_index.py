@@ -0,0 +1,116 @@
+"""
+Persistent index from positions to AccuWeather location keys
+
+A field's AccuWeather location key never changes, so the geoposition search
+only needs to run once per area. Keys are stored in a SQLite file with the
+position they were looked up for, and a lookup within LOCATION_KEY_RADIUS_KM
+of a stored position reuses the nearest stored key.
+"""
+import os
+import math
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger('location_index')
+
+# Index location, on the ./cache volume docker compose shares between the API
+# and worker containers, so keys survive rebuilds and are looked up once
+DEFAULT_INDEX_PATH = os.getenv("LOCATION_INDEX_PATH", os.path.join("cache", "location_keys.sqlite3"))
+
+# Positions closer than this share a location key
+DEFAULT_RADIUS_KM = float(os.getenv("LOCATION_KEY_RADIUS_KM", 2))
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two positions in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocationKeyIndex:
+    """
+    SQLite-backed nearest-neighbour lookup of location keys
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, radius_km=DEFAULT_RADIUS_KM):
+        self.index_path = index_path
+        self.radius_km = radius_km
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS location_keys (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    location_key TEXT NOT NULL,
+                    PRIMARY KEY (lat, lon)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per operation keeps the index safe to use from
+        # forked workers and threads
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def nearest(self, lat, lon):
+        """
+        Return the location key stored nearest to a position within the radius
+
+        Candidates are narrowed with a bounding box on the (lat, lon) primary
+        key before exact distances are computed.
+
+        Returns:
+            str or None: The location key, or None if none is close enough
+        """
+        d_lat = math.degrees(self.radius_km / EARTH_RADIUS_KM)
+        # Longitude degrees shrink towards the poles; clamp to avoid dividing by zero
+        d_lon = d_lat / max(math.cos(math.radians(lat)), 1e-6)
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT lat, lon, location_key FROM location_keys "
+                "WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?",
+                (lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon)
+            ).fetchall()
+
+        best_key, best_distance = None, self.radius_km
+        for row_lat, row_lon, location_key in rows:
+            distance = haversine_km(lat, lon, row_lat, row_lon)
+            if distance <= best_distance:
+                best_key, best_distance = location_key, distance
+        return best_key
+
+    def add(self, lat, lon, location_key):
+        """Store the location key looked up for a position"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO location_keys (lat, lon, location_key) VALUES (?, ?, ?)",
+                (lat, lon, str(location_key))
+            )
+
+    def get_or_lookup(self, lat, lon, lookup):
+        """
+        Return the indexed key for a position, calling lookup(lat, lon) and storing its result on a miss
+        """
+        location_key = self.nearest(lat, lon)
+        if location_key is not None:
+            return location_key
+
+        location_key = lookup(lat, lon)
+        self.add(lat, lon, location_key)
+        logger.info(f"Indexed location key {location_key} for ({lat}, {lon})")
+        return location_key
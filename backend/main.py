@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.controllers import farm_controller
 from fastapi.staticfiles import StaticFiles
 from app.controllers import ai_task_controller
+from app.result_files import LazyResultFiles
 import logging
 
 app = FastAPI()
@@ -19,7 +20,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.mount("/results", StaticFiles(directory="results"), name="results")
+app.mount("/results", LazyResultFiles(directory="results"), name="results")
 
 app.include_router(farm_controller.router, prefix="/api")
 app.include_router(ai_task_controller.router, prefix="/api")
@@ -0,0 +1,107 @@
+"""
+Process-level registry of the trained FarmDataProcessor models
+
+Each worker process loads the preprocessor, yield model and recommendation
+model once (Celery's worker_process_init calls warm_models) and reuses the
+same FarmDataProcessor for every task. The artifacts' modification times and
+sizes are checked at most every MODEL_RELOAD_INTERVAL seconds, and the models
+are reloaded when a new set has been written.
+
+The registry never trains. Train and save the models offline with
+`python farm_data_processor.py`; until they exist, get_processor returns None
+and callers fall back to their model-free output.
+"""
+import os
+import time
+import logging
+import threading
+from farm_data_processor import FarmDataProcessor
+
+logger = logging.getLogger('model_registry')
+
+# Prefix the model files are saved under by FarmDataProcessor.save_models
+MODEL_PREFIX = os.getenv("FARM_MODEL_PREFIX", "models/farm_data")
+
+# Minimum number of seconds between checks for updated model files
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", 5))
+
+MODEL_SUFFIXES = ("preprocessor", "yield_model", "recommendation_model")
+
+
+class ModelRegistry:
+    """
+    Holds one loaded FarmDataProcessor and reloads it when its files change
+    """
+
+    def __init__(self, prefix=MODEL_PREFIX, reload_interval=MODEL_RELOAD_INTERVAL):
+        self.prefix = prefix
+        self.reload_interval = reload_interval
+        self._processor = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def paths(self):
+        return [f"{self.prefix}_{suffix}.pkl" for suffix in MODEL_SUFFIXES]
+
+    def _current_signature(self):
+        """Return (mtime_ns, size) of every model file, or None if any is missing"""
+        try:
+            return tuple(
+                (stat.st_mtime_ns, stat.st_size) for stat in (os.stat(path) for path in self.paths())
+            )
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """
+        Load the models if their files changed since the last load
+
+        A failed load keeps the previously loaded models in service.
+
+        Returns:
+            bool: True if models are loaded
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = self._current_signature()
+            if signature is None:
+                if self._processor is None:
+                    logger.warning(f"No trained models found at {self.prefix}_*.pkl")
+                return self._processor is not None
+            if signature == self._signature:
+                return True
+
+            processor = FarmDataProcessor()
+            try:
+                loaded = processor.load_models(self.prefix)
+            except Exception as e:
+                logger.error(f"Error loading models from {self.prefix}: {str(e)}")
+                loaded = False
+
+            # Files replaced while they were being read are picked up next time
+            if loaded and self._current_signature() == signature:
+                self._processor = processor
+                self._signature = signature
+                logger.info(f"Loaded farm models from {self.prefix}")
+
+            return self._processor is not None
+
+    def get_processor(self):
+        """
+        Return the shared FarmDataProcessor, reloading it first if its files changed
+
+        Returns:
+            FarmDataProcessor or None: None if no models have been trained
+        """
+        if self._processor is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self.load()
+        return self._processor
+
+
+model_registry = ModelRegistry()
+
+
+def warm_models(**kwargs):
+    """Load the models into this process; connected to worker_process_init"""
+    model_registry.load()
@@ -0,0 +1,90 @@
+"""
+Intermediate results of the land processing pipeline
+
+Each stage task of a pipeline run stores its JSON result in Redis under
+pipeline:<run_id>:<stage> for PIPELINE_RESULT_TTL seconds. A stage that is
+retried, redelivered or resubmitted with the same run_id returns the stored
+result instead of recomputing it, so a failure in one stage only reruns that
+stage.
+
+If Redis is unavailable, stages still run but their results are not kept.
+"""
+import os
+import json
+import logging
+import redis
+
+logger = logging.getLogger('pipeline_store')
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+# Seconds a stage result is kept for retries and resubmissions
+PIPELINE_RESULT_TTL = int(os.getenv("PIPELINE_RESULT_TTL", 86400))
+
+
+class StageResultStore:
+    """
+    Redis-backed store of stage results, keyed by run and stage name
+
+    Args:
+        redis_client: Redis client, created from REDIS_URL by default
+        ttl: Seconds a stored result stays available
+    """
+
+    def __init__(self, redis_client=None, ttl=PIPELINE_RESULT_TTL):
+        self._redis = redis_client
+        self.ttl = ttl
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        return self._redis
+
+    @staticmethod
+    def key_for(run_id, stage):
+        return f"pipeline:{run_id}:{stage}"
+
+    def get(self, run_id, stage):
+        """
+        Returns:
+            tuple: (found, result); results may legitimately be None
+        """
+        try:
+            value = self.redis.get(self.key_for(run_id, stage))
+        except redis.RedisError as e:
+            logger.warning(f"Pipeline store unavailable: {str(e)}")
+            return False, None
+        if value is None:
+            return False, None
+        return True, json.loads(value)["result"]
+
+    def put(self, run_id, stage, result):
+        try:
+            self.redis.set(self.key_for(run_id, stage), json.dumps({"result": result}), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Could not store {stage} result of run {run_id}: {str(e)}")
+
+    def run(self, run_id, stage, compute):
+        """
+        Return the stored result of a stage, or compute and store it
+
+        Args:
+            run_id: Pipeline run the stage belongs to
+            stage: Stage name
+            compute: Zero-argument callable producing a JSON-serialisable result
+
+        Returns:
+            The stage result
+        """
+        found, result = self.get(run_id, stage)
+        if found:
+            logger.info(f"Reusing {stage} result of run {run_id}")
+            return result
+
+        result = compute()
+        self.put(run_id, stage, result)
+        return result
+
+
+stage_store = StageResultStore()
@@ -6,58 +6,226 @@ from sklearn.metrics.pairwise import cosine_similarity
 from ortools.sat.python import cp_model
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
-from celery import Celery
+from celery import Celery, chain, chord
 from sqlalchemy.sql import text  # Safe SQL queries
 from os import getenv
-from app.db import lands_collection
-from imageProcess import process_image_sync
-from gemini_integration import generate_gemini_insights
+import httpx
+import redis
+from pymongo.errors import ConnectionFailure
+from worker_runtime import get_collection, run_async
+from imageProcess import process_image_sync, process_batch_frames, aggregate_batch
+from gemini_integration import (
+    SENSOR_DATA, GeminiFallback, GeminiCallFailed, create_fallback_output, fetch_weather_stage,
+    fetch_model_weather, model_insights_stage, synthesize_gemini_insights
+)
+from model_registry import model_registry
+from pipeline_store import stage_store
+from field_zones import field_center
 
 # Import Celery instance
 from celery_worker import celery_app
 from datetime import datetime
-import asyncio
-
-# ---------------- Celery Task ---------------- #
-@celery_app.task(name="process_event")
-def process_event(user_id: str, land_id: str):
-    """Background Task to Process Farm Image Analysis"""
-    
-    # Create a wrapper to handle the async operations
-    async def async_process():
-        # Get the land data using async MongoDB operation
-        data = await lands_collection.find_one({"userId": user_id, "land.landId": land_id})
-        if not data:
-            return {"status": "Failed", "message": "No farm area found for this user"}
-        
-        # Process the image synchronously (no async needed here)
-        img_res = process_image_sync(data['land']['image'])
+
+# ---------------- Celery Tasks ---------------- #
+# process_event loads the land and replaces itself with the stage workflow:
+#
+#   analyze_image ---------------------------------------------------\
+#                                                                     >-- save_results
+#   fetch_weather --> model_insights --> synthesize_insights -------/
+#
+# fetch_weather makes every weather call, so model_insights only runs the
+# models. Every stage stores its result in the pipeline store under the run
+# id, so a retried or resubmitted stage reuses finished work and a failure
+# only reruns the failed stage. Task names are prefixed with "land." for
+# queue routing.
+
+# Errors a retry may not hit again; anything else fails the stage at once
+TRANSIENT_ERRORS = (
+    httpx.TransportError,
+    redis.ConnectionError,
+    redis.TimeoutError,
+    ConnectionFailure,
+    ConnectionError,
+    TimeoutError,
+)
+
+STAGE_RETRY_OPTIONS = {
+    "bind": True,
+    "acks_late": True,
+    "autoretry_for": TRANSIENT_ERRORS,
+    "retry_backoff": True,
+    "retry_jitter": True,
+    "max_retries": 3,
+}
+
+
+@celery_app.task(bind=True, name="process_event")
+def process_event(self, user_id: str, land_id: str, zone_grid: list = None, run_id: str = None):
+    """
+    Background Task to Process Farm Image Analysis
+    
+    Pass the run_id of an earlier, failed run to reuse its finished stages.
+    """
+    
+    async def load_land():
+        return await get_collection("lands").find_one({"userId": user_id, "land.landId": land_id})
+    
+    # Run on this worker process's persistent loop, where its Motor client lives
+    data = run_async(load_land())
+    if not data:
+        return {"status": "Failed", "message": "No farm area found for this user"}
+    
+    # Weather is looked up for the middle of the field, if one was drawn
+    coordinates = data['land'].get('coordinates')
+    lat, lon = field_center(coordinates) if coordinates else (None, None)
+    land = {
+        "user_id": user_id,
+        "land_id": land_id,
+        "image": data['land']['image'],
+        "image_hash": data['land'].get('imageHash'),
+        "coordinates": coordinates,
+        "crop": data['land']['crop'],
+        "zone_grid": zone_grid,
+        "lat": lat,
+        "lon": lon,
+    }
+    
+    # The workflow's final result is stored under this task's id
+    raise self.replace(build_land_workflow(land, run_id or self.request.id))
+
+
+def build_land_workflow(land, run_id):
+    """Return the chord of stage tasks that processes one land"""
+    insights = chain(
+        fetch_weather.si(land, run_id),
+        model_insights.s(land, run_id),
+        synthesize_insights.s(land, run_id)
+    )
+    return chord([analyze_image.si(land, run_id), insights], save_results.s(land, run_id))
+
+
+@celery_app.task(name="land.analyze_image", **STAGE_RETRY_OPTIONS)
+def analyze_image(self, land, run_id):
+    """Image analysis stage, counting only the pixels inside the drawn field boundary"""
+    
+    def compute():
+        img_res = process_image_sync(
+            land['image'],
+            field_coordinates=land['coordinates'],
+            zone_grid=land['zone_grid'],
+            content_hash=land['image_hash']
+        )
         
+        # "path" is the screen-sized preview; the full level renders when first requested
         image_insights = [
             {
                 "path": img_res['plant_health_image'],
+                "thumbnail": img_res['plant_health_pyramid'].get('thumbnail'),
+                "full": img_res['plant_health_pyramid']['full'],
                 "value": img_res['plant_health_percentage']
             },
             {
                 "path": img_res['soil_analysis_image'],
+                "thumbnail": img_res['soil_analysis_pyramid'].get('thumbnail'),
+                "full": img_res['soil_analysis_pyramid']['full'],
                 "value": img_res['estimated_soil_moisture']
             }
         ]
-        
-        lat_lon = data['land']['coordinates'][0]
-        farm_data = generate_gemini_insights(
-            current_crop=data['land']['crop'],
-            lat=lat_lon[0],
-            lon=lat_lon[1],
-            image_path=data['land']['image']
+        # Field statistics exist only for lands with a drawn boundary
+        return {"imageInsights": image_insights, "fieldZones": img_res.get('field')}
+    
+    return stage_store.run(run_id, "analyze_image", compute)
+
+
+@celery_app.task(name="land.fetch_weather", **STAGE_RETRY_OPTIONS)
+def fetch_weather(self, land, run_id):
+    """
+    Weather stage: the conditions for the Gemini prompt and the readings the
+    farm models score with
+    """
+    
+    def compute():
+        return {
+            "conditions": fetch_weather_stage(land['lat'], land['lon']),
+            "readings": fetch_model_weather(land['lat'], land['lon']),
+        }
+    
+    return stage_store.run(run_id, "fetch_weather", compute)
+
+
+@celery_app.task(name="land.model_insights", **STAGE_RETRY_OPTIONS)
+def model_insights(self, weather, land, run_id):
+    """
+    Model inference stage, scoring with the fetched weather readings; the
+    insights are None until models have been trained
+    
+    Transient errors are retried. Any other model or data error is not
+    stored and leaves the insights None, so the run still finishes with the
+    fallback recommendation and a resubmitted run tries the models again.
+    
+    Returns:
+        list: [weather conditions, insights] for synthesize_insights
+    """
+    
+    def compute():
+        processor = model_registry.get_processor()
+        if processor is None:
+            return None
+        return model_insights_stage(
+            processor, dict(SENSOR_DATA), land['crop'], land['lat'], land['lon'],
+            weather_data=weather['readings']
         )
-        
-        # Update the database using async operation
-        await lands_collection.update_one(
-            {"userId": user_id, "land.landId": land_id},
+    
+    try:
+        insights = stage_store.run(run_id, "model_insights", compute)
+    except TRANSIENT_ERRORS:
+        raise
+    except Exception as e:
+        print(f"Model insights failed for run {run_id}, continuing without them: {e}")
+        insights = None
+    
+    return [weather['conditions'], insights]
+
+
+@celery_app.task(
+    name="land.synthesize_insights",
+    **{**STAGE_RETRY_OPTIONS, "autoretry_for": TRANSIENT_ERRORS + (GeminiCallFailed,)}
+)
+def synthesize_insights(self, stage_results, land, run_id):
+    """
+    Gemini stage, run once the weather and model stages have finished
+    
+    Failed Gemini calls are retried; the fallback recommendation is used only
+    when retrying cannot help or after the last retry. It is not stored, so a
+    resubmitted run asks Gemini again.
+    """
+    weather_data, insights = stage_results
+    try:
+        return stage_store.run(
+            run_id, "synthesize_insights",
+            lambda: synthesize_gemini_insights(
+                land['crop'], insights, weather_data, image_path=land['image'], fallback=False
+            )
+        )
+    except GeminiFallback as e:
+        if isinstance(e, GeminiCallFailed) and self.request.retries < self.max_retries:
+            raise
+        print(f"Using fallback insights for run {run_id}: {e}")
+        return create_fallback_output(dict(SENSOR_DATA), land['crop'], insights or {}, weather_data)
+
+
+@celery_app.task(name="land.save_results", **STAGE_RETRY_OPTIONS)
+def save_results(self, stage_results, land, run_id):
+    """Write the image and insight results to the land document; safe to repeat"""
+    image_res, farm_data = stage_results
+    
+    async def update_land():
+        await get_collection("lands").update_one(
+            {"userId": land['user_id'], "land.landId": land['land_id']},
             {
                 "$set": {
-                    "imageInsights": image_insights,
+                    "imageInsights": image_res['imageInsights'],
+                    "fieldZones": image_res['fieldZones'],
                     "soil": farm_data['soil'],
                     "predictedYield": farm_data['predictedYield'],
                     "carbonFootprint": farm_data['carbonFootprint'],
@@ -68,17 +236,47 @@ def process_event(user_id: str, land_id: str):
                 }
             }
         )
-        
-        return {"status": "Success", "message": "Farm area processed successfully"}
     
-    # Run the async function and return its result
-    loop = asyncio.get_event_loop()
+    run_async(update_land())
+    return {"status": "Success", "message": "Farm area processed successfully", "run_id": run_id}
+
+
+@celery_app.task(bind=True, name="process_image_batch")
+def process_image_batch(self, image_paths: list, workers: int = None, metrics_only: bool = False):
+    """
+    Background Task to analyse every frame of a flight as one job
     
-    # If running in an environment where the event loop is already running
-    # (like within a Tornado or FastAPI app), use this instead:
-    try:
-        # Try to use an event loop if one exists
-        return asyncio.get_event_loop().run_until_complete(async_process())
-    except RuntimeError:
-        # If no event loop exists in this thread, create one
-        return asyncio.run(async_process())
\ No newline at end of file
+    The frames are split into at most workers contiguous parts, one per
+    frame by default, that run as parallel batch.analyze_frames tasks on
+    the cpu queue. A chord callback aggregates them into this task's result.
+    """
+    if not image_paths:
+        return {"status": "Failed", "message": "No images provided"}
+    
+    parts = max(1, min(workers or len(image_paths), len(image_paths)))
+    size = -(-len(image_paths) // parts)
+    chunks = [image_paths[i:i + size] for i in range(0, len(image_paths), size)]
+    
+    # metrics_only skips rendering overlays, for cheap bulk re-scoring
+    raise self.replace(chord(
+        [analyze_frames.si(chunk, metrics_only) for chunk in chunks],
+        aggregate_frames.s()
+    ))
+
+
+@celery_app.task(name="batch.analyze_frames")
+def analyze_frames(image_paths: list, metrics_only: bool = False):
+    """Analyse one part of a batch; failed frames are reported, not raised"""
+    return process_batch_frames(image_paths, metrics_only=metrics_only)
+
+
+@celery_app.task(name="batch.aggregate_frames")
+def aggregate_frames(parts: list):
+    """Chord callback joining the parts of a batch in order"""
+    frames = [frame for part in parts for frame in part]
+    return {
+        "status": "Success",
+        "message": f"Processed {len(frames)} images",
+        "frames": frames,
+        "aggregate": aggregate_batch(frames)
+    }
@@ -0,0 +1,10 @@
+"""
+Run from the backend directory with: python -m pytest tests
+"""
+import os
+import sys
+
+# The backend modules are imported flat, as the app and workers do
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,71 @@
+"""
+Features pooled over a recording must match extracting each window on its
+own, the way the classifier's training features were computed
+"""
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "beeHieve"))
+
+from bee_features import HOP_LENGTH, N_BASE_FEATURES, SegmentFeatureExtractor  # noqa: E402
+
+SR = 16000
+
+# Pooled frames are bit-for-bit the windows' own frames; only float32 sums in
+# the STFT and filter banks may round differently
+RTOL = 1e-4
+ATOL = 1e-5
+
+
+@pytest.fixture(scope="module")
+def recording():
+    """A gliding tone with amplitude modulation, noise and a near-silent second"""
+    rng = np.random.default_rng(0)
+    t = np.arange(21 * SR // 2) / SR
+    audio = 0.3 * np.sin(2 * np.pi * (220 + 50 * np.sin(t / 3)) * t) * (1 + 0.5 * np.sin(2 * np.pi * 0.3 * t))
+    audio += 0.05 * rng.standard_normal(len(t))
+    audio[4 * SR:5 * SR] *= 0.05
+    return audio.astype(np.float32)
+
+
+@pytest.fixture(autouse=True)
+def quiet_tuning_warnings():
+    # Near-silent windows have no pitch peaks to estimate tuning from, in both modes
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="Trying to estimate tuning from empty frequency set")
+        yield
+
+
+def _extract_each(extractor, audio, starts, ends):
+    return np.array([extractor.extract(audio[start:end]) for start, end in zip(starts, ends)])
+
+
+@pytest.mark.parametrize("hop_seconds", [
+    3.0,                     # Back to back
+    11 * HOP_LENGTH / SR,    # Overlapping, on the frame grid
+    0.5,                     # Overlapping, off the frame grid
+])
+def test_extract_windows_matches_extract(recording, hop_seconds):
+    extractor = SegmentFeatureExtractor(SR)
+    starts, ends, features = extractor.extract_windows(recording, 3.0, hop_seconds)
+
+    assert features.shape == (len(starts), N_BASE_FEATURES)
+    # The last windows are cut short by the end of the recording
+    assert ends[-1] == len(recording) and ends[-1] - starts[-1] < 3 * SR
+    np.testing.assert_allclose(features, _extract_each(extractor, recording, starts, ends), rtol=RTOL, atol=ATOL)
+
+
+def test_pool_windows_matches_extract_inside_block(recording):
+    # Streamed blocks pool windows that start and end away from the block edges
+    extractor = SegmentFeatureExtractor(SR, n_features=N_BASE_FEATURES + 1)
+    starts = np.arange(1000, 5 * SR, 8 * HOP_LENGTH)
+    ends = starts + 2 * SR
+
+    features = extractor.pool_windows(recording, starts, ends)
+
+    assert not features[:, N_BASE_FEATURES:].any()
+    np.testing.assert_allclose(features, _extract_each(extractor, recording, starts, ends), rtol=RTOL, atol=ATOL)
@@ -0,0 +1,53 @@
+"""
+The pandas-free single-record soil analysis must give the same result as
+the DataFrame reference implementation and the batch path
+"""
+import math
+
+import pytest
+
+from farm_data_processor import FarmDataProcessor, SensorRecord
+
+READINGS = [
+    {'N': 50, 'P': 30, 'K': 40, 'temperature': 25.0, 'humidity': 70.0, 'rainfall': 5.0, 'soil_type': 'Clay'},
+    {'N': 0, 'P': 0, 'K': 0, 'temperature': -5.0, 'humidity': 0.0, 'rainfall': 0.0, 'soil_type': 'Sandy'},
+    {'N': 250, 'P': 140, 'K': 120, 'temperature': 40.0, 'humidity': 100.0, 'rainfall': 300.0, 'soil_type': 'Loamy'},
+    # Readings on the nutrient thresholds and the index bin edges
+    {'N': 100, 'P': 25, 'K': 100, 'temperature': 20.0, 'humidity': 100.0, 'rainfall': 0.0, 'soil_type': 'Clay'},
+    {'N': 200, 'P': 50, 'K': 25, 'temperature': 20.0, 'humidity': 0.0, 'rainfall': 100.0, 'soil_type': 'Clay'},
+    {'N': 49.999, 'P': 99.999, 'K': 50.001, 'temperature': 20.0, 'humidity': 60.0, 'rainfall': 60.0, 'soil_type': None},
+    {'N': float('nan'), 'P': 30, 'K': 40, 'temperature': 25.0, 'humidity': float('nan'), 'rainfall': 5.0, 'soil_type': 'Clay'},
+]
+
+
+def _assert_same(actual, expected, path="soil_health"):
+    assert type(actual) is type(expected) or isinstance(actual, float) and isinstance(expected, float), path
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys(), path
+        for key in expected:
+            _assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, float) and math.isnan(expected):
+        assert math.isnan(actual), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return FarmDataProcessor()
+
+
+@pytest.mark.parametrize("reading", READINGS)
+def test_record_matches_dataframe(processor, reading):
+    expected = processor.analyze_soil_health(processor.to_frame(reading))
+    _assert_same(processor.analyze_soil_health_record(SensorRecord.from_dict(reading)), expected)
+
+
+def test_record_matches_batch(processor):
+    for reading, expected in zip(READINGS, processor.analyze_soil_health_batch(READINGS)):
+        _assert_same(processor.analyze_soil_health_record(SensorRecord.from_dict(reading)), expected)
+
+
+def test_generate_insights_uses_record_path(processor):
+    insights = processor.generate_insights(dict(READINGS[0]))
+    _assert_same(insights['soil_health'], processor.analyze_soil_health(processor.to_frame(READINGS[0])))
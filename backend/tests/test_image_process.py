@@ -0,0 +1,110 @@
+"""
+The fused and tiled analysis paths must match the reference implementation,
+_detect_plant_health followed by _analyze_soil, pixel for pixel, and one
+processor must be safe to share between threads
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+import tifffile
+
+from imageProcess import HEALTHY_COLOR, SOIL_COLOR, UNHEALTHY_COLOR, ImageProcessor, TileSource
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "image.png")
+
+
+def _reference_masks(processor, hsv_image):
+    """The masks _detect_plant_health and _analyze_soil build internally"""
+    kernel = np.ones((5, 5), np.uint8)
+    healthy = cv2.inRange(hsv_image, processor.healthy_green_lower, processor.healthy_green_upper)
+    plant = cv2.inRange(hsv_image, np.array([20, 30, 30]), np.array([100, 255, 255]))
+    plant = cv2.morphologyEx(cv2.morphologyEx(plant, cv2.MORPH_OPEN, kernel), cv2.MORPH_CLOSE, kernel)
+    unhealthy = cv2.bitwise_and(plant, cv2.bitwise_not(healthy))
+    soil = cv2.inRange(hsv_image, processor.soil_lower, processor.soil_upper)
+    soil = cv2.morphologyEx(cv2.morphologyEx(soil, cv2.MORPH_OPEN, kernel), cv2.MORPH_CLOSE, kernel)
+    return healthy, plant, unhealthy, soil
+
+
+def _reference(processor, rgb_image):
+    hsv_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2HSV)
+    health_viz, health_percentage = processor._detect_plant_health(rgb_image, hsv_image)
+    soil_viz, moisture_estimate = processor._analyze_soil(rgb_image, hsv_image)
+    return _reference_masks(processor, hsv_image), health_percentage, moisture_estimate, health_viz, soil_viz
+
+
+@pytest.fixture(params=["sample", "random"])
+def rgb_image(request):
+    if request.param == "sample":
+        return cv2.cvtColor(cv2.imread(SAMPLE_IMAGE), cv2.COLOR_BGR2RGB)
+    # Smooth noise, so there are mask regions that survive the clean-up
+    noise = np.random.default_rng(0).integers(0, 256, (37, 29, 3), dtype=np.uint8)
+    return cv2.resize(noise, (301, 389), interpolation=cv2.INTER_CUBIC)
+
+
+def test_fused_matches_reference(rgb_image):
+    processor = ImageProcessor()
+    masks, health_percentage, moisture_estimate, health_ref, soil_ref = _reference(processor, rgb_image)
+
+    fused_masks = processor._compute_masks(cv2.cvtColor(rgb_image, cv2.COLOR_RGB2HSV))
+    for fused, reference in zip(fused_masks, masks):
+        np.testing.assert_array_equal(fused, reference)
+
+    health_viz = np.empty_like(rgb_image)
+    soil_viz = np.empty_like(rgb_image)
+    assert processor._analyze_fused(rgb_image, fused_masks, health_viz, soil_viz) == (
+        health_percentage, moisture_estimate
+    )
+    np.testing.assert_array_equal(health_viz, health_ref)
+    np.testing.assert_array_equal(soil_viz, soil_ref)
+
+
+@pytest.mark.parametrize("tile_size", [64, 112])
+def test_tiled_matches_reference(rgb_image, tile_size, tmp_path):
+    processor = ImageProcessor()
+    masks, health_percentage, moisture_estimate, health_ref, soil_ref = _reference(processor, rgb_image)
+
+    image_path = str(tmp_path / "image.tif")
+    tifffile.imwrite(image_path, rgb_image)
+
+    # Results report the percentages rounded to two decimals
+    result = processor.process_image_tiled(image_path, tile_size, metrics_only=True)
+    assert result["plant_health_percentage"] == round(health_percentage, 2)
+    assert result["estimated_soil_moisture"] == round(moisture_estimate, 2)
+
+    tiled_masks = [np.zeros_like(mask) for mask in masks]
+    health_viz = np.empty_like(rgb_image)
+    soil_viz = np.empty_like(rgb_image)
+    source = TileSource(image_path)
+    try:
+        for y, x, (rgb, healthy, plant, unhealthy, soil), _ in processor._iter_tile_masks(source, tile_size):
+            window = np.s_[y:y + rgb.shape[0], x:x + rgb.shape[1]]
+            for out, mask in zip(tiled_masks, (healthy, plant, unhealthy, soil)):
+                out[window] = mask
+            processor._render_overlay(
+                rgb, [(healthy, HEALTHY_COLOR), (unhealthy, UNHEALTHY_COLOR)], health_viz[window]
+            )
+            processor._render_overlay(rgb, [(soil, SOIL_COLOR)], soil_viz[window])
+    finally:
+        source.close()
+
+    for tiled, reference in zip(tiled_masks, masks):
+        np.testing.assert_array_equal(tiled, reference)
+    np.testing.assert_array_equal(health_viz, health_ref)
+    np.testing.assert_array_equal(soil_viz, soil_ref)
+
+
+def test_shared_processor_is_thread_safe(rgb_image, tmp_path):
+    processor = ImageProcessor()
+    images = [rgb_image, np.ascontiguousarray(rgb_image[::-1]), np.ascontiguousarray(rgb_image[:, ::-1])]
+    paths = []
+    for i, image in enumerate(images):
+        paths.append(str(tmp_path / f"image{i}.png"))
+        cv2.imwrite(paths[-1], cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+
+    expected = [processor.process_image(path, metrics_only=True) for path in paths]
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        for _ in range(5):
+            assert list(executor.map(lambda p: processor.process_image(p, metrics_only=True), paths)) == expected
@@ -0,0 +1,85 @@
+"""
+Streamed multipart uploads must enforce the per-file, total and file-count
+limits, remove the files of a rejected upload, and keep the form documented
+"""
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.uploads import multipart_request_body, receive_upload_form
+
+MAX_BYTES = 1000
+MAX_FILES = 3
+MAX_TOTAL_BYTES = 2500
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    return tmp_path
+
+
+@pytest.fixture
+def client(upload_dir):
+    app = FastAPI()
+
+    @app.post(
+        "/upload",
+        openapi_extra=multipart_request_body(
+            {"frames": {"type": "array", "items": {"type": "string", "format": "binary"}}}, required=["frames"]
+        ),
+    )
+    async def upload(request: Request):
+        fields, files = await receive_upload_form(
+            request,
+            lambda field, filename: os.path.join(upload_dir, filename),
+            max_bytes=MAX_BYTES,
+            max_files=MAX_FILES,
+            max_total_bytes=MAX_TOTAL_BYTES,
+        )
+        return {"fields": fields, "sizes": [stored.size for stored in files]}
+
+    return TestClient(app)
+
+
+def _frames(*sizes):
+    return [("frames", (f"frame{i}.png", b"x" * size, "image/png")) for i, size in enumerate(sizes)]
+
+
+def test_accepts_upload_within_limits(client, upload_dir):
+    response = client.post("/upload", data={"note": "flight"}, files=_frames(900, 900))
+    assert response.status_code == 200
+    assert response.json() == {"fields": {"note": "flight"}, "sizes": [900, 900]}
+    assert sorted(os.listdir(upload_dir)) == ["frame0.png", "frame1.png"]
+
+
+@pytest.mark.parametrize("sizes, status_code", [
+    ((1001,), 413),           # One file over max_bytes
+    ((900, 900, 900), 413),   # Every file within max_bytes, the form over max_total_bytes
+    ((10, 10, 10, 10), 400),  # More than max_files
+])
+def test_rejects_upload_over_limits(client, upload_dir, sizes, status_code):
+    response = client.post("/upload", files=_frames(*sizes))
+    assert response.status_code == status_code
+    assert os.listdir(upload_dir) == []
+
+
+def test_rejects_content_length_over_total_before_reading(client, upload_dir):
+    response = client.post(
+        "/upload",
+        content=b"",
+        headers={
+            "content-type": "multipart/form-data; boundary=x",
+            "content-length": str(MAX_TOTAL_BYTES + MAX_FILES * 64 * 1024 + 1),
+        },
+    )
+    assert response.status_code == 413
+    assert "in total" in response.json()["detail"]
+
+
+def test_form_is_documented(client):
+    body = client.get("/openapi.json").json()["paths"]["/upload"]["post"]["requestBody"]
+    schema = body["content"]["multipart/form-data"]["schema"]
+    assert schema["required"] == ["frames"]
+    assert schema["properties"]["frames"]["items"]["format"] == "binary"
@@ -0,0 +1,248 @@
+"""
+Vegetation index engine for RGB farm imagery
+
+Computes RGB vegetation indices as float32 rasters and summarises them with
+histograms and percentiles, either for a whole image in memory or
+incrementally over tiles so large orthomosaics never need a full-frame
+float copy.
+
+Indices:
+    exg:  Excess green on chromatic coordinates, 2g - r - b, in [-1, 2]
+    vari: Visible atmospherically resistant index, (G - R) / (G + R - B),
+          clipped to [-1, 1] because the denominator can approach zero
+    gli:  Green leaf index, (2G - R - B) / (2G + R + B), in [-1, 1]
+
+Pixels where an index is undefined (e.g. pure black) are NaN in the raster
+and left out of the summaries.
+"""
+import numpy as np
+
+INDEX_NAMES = ("exg", "vari", "gli")
+
+# Value range of each index, used as the fixed histogram range so histograms
+# from different tiles can be added together
+INDEX_RANGES = {
+    "exg": (-1.0, 2.0),
+    "vari": (-1.0, 1.0),
+    "gli": (-1.0, 1.0),
+}
+
+DEFAULT_BINS = 64
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def compute_indices(rgb_image, indices=INDEX_NAMES):
+    """
+    Compute vegetation index rasters from an RGB image
+
+    The image is converted to float32 once and the indices share their
+    intermediate sums, with the arithmetic done in place where possible.
+
+    Args:
+        rgb_image: uint8 array of shape (H, W, 3) in RGB order
+        indices: Names of the indices to compute
+
+    Returns:
+        dict: {index name: float32 array of shape (H, W)}
+    """
+    unknown = set(indices) - set(INDEX_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown vegetation indices: {sorted(unknown)}")
+
+    rgb = rgb_image.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rasters = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if "exg" in indices or "gli" in indices:
+            # 2G - R - B is the numerator of both ExG and GLI
+            green_excess = g * 2
+            green_excess -= r
+            green_excess -= b
+
+            if "exg" in indices:
+                total = r + g
+                total += b
+                rasters["exg"] = green_excess / total
+
+            if "gli" in indices:
+                denominator = g * 2
+                denominator += r
+                denominator += b
+                rasters["gli"] = green_excess / denominator
+
+        if "vari" in indices:
+            denominator = g + r
+            denominator -= b
+            vari = g - r
+            vari /= denominator
+            np.clip(vari, -1.0, 1.0, out=vari)
+            rasters["vari"] = vari
+
+    # Undefined ratios (0/0 or x/0) become NaN so they drop out of summaries
+    for raster in rasters.values():
+        raster[~np.isfinite(raster)] = np.nan
+
+    return {name: rasters[name] for name in indices}
+
+
+def summarize_indices(rasters, bins=DEFAULT_BINS, percentiles=DEFAULT_PERCENTILES):
+    """
+    Summarise index rasters with exact statistics
+
+    Args:
+        rasters: {index name: float array} as returned by compute_indices
+        bins: Number of histogram bins over the index's value range
+        percentiles: Percentiles to report
+
+    Returns:
+        dict: {index name: summary dict}
+    """
+    summaries = {}
+    for name, raster in rasters.items():
+        values = raster[~np.isnan(raster)]
+        counts, edges = np.histogram(values, bins=bins, range=INDEX_RANGES[name])
+        summary = _histogram_summary(counts, edges)
+
+        if values.size:
+            summary.update({
+                "mean": float(values.mean(dtype=np.float64)),
+                "std": float(values.std(dtype=np.float64)),
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "percentiles": {
+                    str(p): float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))
+                },
+            })
+        else:
+            summary["percentiles"] = {str(p): None for p in percentiles}
+
+        summaries[name] = summary
+    return summaries
+
+
+class IndexAccumulator:
+    """
+    Incremental index summaries for images processed tile by tile
+
+    Histograms over fixed ranges and moment sums are merged across tiles, so
+    memory does not depend on the image size. Percentiles are interpolated
+    from the merged histogram and are accurate to within one bin width.
+    """
+
+    def __init__(self, indices=INDEX_NAMES, bins=DEFAULT_BINS, percentiles=DEFAULT_PERCENTILES):
+        self.indices = tuple(indices)
+        self.bins = bins
+        self.percentiles = tuple(percentiles)
+        self._counts = {name: np.zeros(bins, dtype=np.int64) for name in self.indices}
+        self._sums = {name: np.zeros(2, dtype=np.float64) for name in self.indices}
+        self._min = {name: np.inf for name in self.indices}
+        self._max = {name: -np.inf for name in self.indices}
+
+    def update(self, rgb_tile, mask=None):
+        """Add the index values of one RGB tile, only where mask is non-zero if one is given"""
+        if mask is not None:
+            rgb_tile = rgb_tile[mask > 0]
+        for name, raster in compute_indices(rgb_tile, self.indices).items():
+            values = raster[~np.isnan(raster)]
+            if not values.size:
+                continue
+
+            counts, _ = np.histogram(values, bins=self.bins, range=INDEX_RANGES[name])
+            self._counts[name] += counts
+
+            values = values.astype(np.float64)
+            self._sums[name] += (values.sum(), np.dot(values, values))
+            self._min[name] = min(self._min[name], float(values.min()))
+            self._max[name] = max(self._max[name], float(values.max()))
+
+    def update_rows(self, rgb_image, mask=None, rows=512):
+        """Add an in-memory image in bands of rows to bound the float working set"""
+        for y in range(0, rgb_image.shape[0], rows):
+            self.update(rgb_image[y:y + rows], None if mask is None else mask[y:y + rows])
+
+    def summary(self):
+        """
+        Returns:
+            dict: {index name: summary dict} in the same layout as summarize_indices
+        """
+        summaries = {}
+        for name in self.indices:
+            counts = self._counts[name]
+            edges = np.linspace(*INDEX_RANGES[name], self.bins + 1)
+            summary = _histogram_summary(counts, edges)
+
+            n = int(counts.sum())
+            if n:
+                total, total_sq = self._sums[name]
+                mean = total / n
+                summary.update({
+                    "mean": float(mean),
+                    "std": float(np.sqrt(max(total_sq / n - mean * mean, 0.0))),
+                    "min": self._min[name],
+                    "max": self._max[name],
+                    "percentiles": {
+                        str(p): _histogram_percentile(counts, edges, p) for p in self.percentiles
+                    },
+                })
+            else:
+                summary["percentiles"] = {str(p): None for p in self.percentiles}
+
+            summaries[name] = summary
+        return summaries
+
+
+def _histogram_summary(counts, edges):
+    return {
+        "count": int(counts.sum()),
+        "mean": None,
+        "std": None,
+        "min": None,
+        "max": None,
+        "histogram": {
+            "edges": [float(e) for e in edges],
+            "counts": [int(c) for c in counts],
+        },
+    }
+
+
+def _histogram_percentile(counts, edges, percentile):
+    """Interpolate a percentile linearly within the histogram bin that contains it"""
+    cumulative = np.cumsum(counts)
+    target = percentile / 100 * cumulative[-1]
+    i = int(np.searchsorted(cumulative, target))
+    i = min(i, len(counts) - 1)
+    below = cumulative[i - 1] if i else 0
+    fraction = (target - below) / counts[i] if counts[i] else 0.0
+    return float(edges[i] + fraction * (edges[i + 1] - edges[i]))
+
+
+def analyze_image_indices(image_path, tile_size=None, indices=INDEX_NAMES):
+    """
+    Summarise the vegetation indices of an image file
+
+    Args:
+        image_path: Path to the input image
+        tile_size: Read and process the image in tiles of this size to bound
+            memory; by default the whole image is processed at once with
+            exact percentiles
+        indices: Names of the indices to compute
+
+    Returns:
+        dict: {index name: summary dict}
+    """
+    from imageProcess import TileSource
+
+    source = TileSource(image_path)
+    try:
+        if tile_size is None:
+            rasters = compute_indices(source.read(0, source.height, 0, source.width), indices)
+            return summarize_indices(rasters)
+
+        accumulator = IndexAccumulator(indices)
+        for y in range(0, source.height, tile_size):
+            for x in range(0, source.width, tile_size):
+                accumulator.update(source.read(y, y + tile_size, x, x + tile_size))
+        return accumulator.summary()
+    finally:
+        source.close()
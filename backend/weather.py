@@ -0,0 +1,357 @@
+"""
+Weather provider layer with a shared, spatially bucketed cache
+
+Weather changes slowly in time and space, so readings are cached per
+provider on a lat/lon grid of WEATHER_BUCKET_DEGREES for WEATHER_CACHE_TTL
+seconds. The cache lives in Redis so every API and Celery worker shares it.
+A short Redis lock per bucket coalesces requests: when concurrent tasks ask
+for nearby fields, one of them calls the upstream API and the others wait
+for its result. Every field in a bucket gets the reading for the bucket's
+centre.
+
+If Redis is unreachable the cache falls back to process memory.
+
+Providers:
+    openweather: Current conditions from OpenWeatherMap
+    accuweather: Temperature and humidity from AccuWeather current
+                 conditions, rainfall from its 1-day forecast; location keys
+                 are kept in a persistent LocationKeyIndex
+    stub:        Fixed readings without network access, for tests and local
+                 development (set WEATHER_PROVIDER=stub to use it everywhere)
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import redis
+from http_client import get_client
+from location_index import LocationKeyIndex
+
+logger = logging.getLogger('weather')
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+# Seconds a cached reading stays valid
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", 1800))
+
+# Grid cell size in degrees; 0.05 is roughly 5 km
+WEATHER_BUCKET_DEGREES = float(os.getenv("WEATHER_BUCKET_DEGREES", 0.05))
+
+# Forces a single provider for every lookup, e.g. "stub"
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER")
+
+# How long one worker may hold a bucket lock while fetching
+LOCK_TIMEOUT = 30
+
+# Seconds to stop trying Redis after it fails, so lookups do not stall on it
+REDIS_RETRY_INTERVAL = 30
+
+
+class WeatherProvider:
+    """
+    Base class for upstream weather sources
+    """
+
+    name = None
+
+    def fetch(self, lat, lon):
+        """
+        Fetch the current weather at a location
+
+        Returns:
+            dict: JSON-serialisable weather reading
+
+        Raises:
+            Exception: If the reading cannot be fetched; failures are not cached
+        """
+        raise NotImplementedError
+
+
+class OpenWeatherProvider(WeatherProvider):
+    name = "openweather"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("OPENWEATHER_API_KEY")
+
+    def fetch(self, lat, lon):
+        if not self.api_key:
+            raise ValueError("OpenWeatherMap API key not found. Set OPENWEATHER_API_KEY environment variable.")
+
+        response = get_client().get(
+            "https://api.openweathermap.org/data/2.5/weather",
+            params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"}
+        )
+        response.raise_for_status()
+        weather_data = response.json()
+
+        return {
+            "temperature": weather_data["main"]["temp"],
+            "humidity": weather_data["main"]["humidity"],
+            "precipitation": weather_data.get("rain", {}).get("1h", 0),
+            "wind_speed": weather_data["wind"]["speed"],
+            "conditions": weather_data["weather"][0]["main"],
+            "description": weather_data["weather"][0]["description"]
+        }
+
+
+class AccuWeatherProvider(WeatherProvider):
+    name = "accuweather"
+
+    base_url = "http://dataservice.accuweather.com"
+
+    def __init__(self, api_key=None, location_index=None):
+        self.api_key = api_key or os.getenv("ACCUWEATHER_API_KEY")
+        self._location_index = location_index
+
+    @property
+    def location_index(self):
+        if self._location_index is None:
+            self._location_index = LocationKeyIndex()
+        return self._location_index
+
+    def _get(self, path, **params):
+        if not self.api_key:
+            raise ValueError("AccuWeather API key not found. Set ACCUWEATHER_API_KEY environment variable.")
+
+        response = get_client().get(f"{self.base_url}{path}", params=dict(params, apikey=self.api_key))
+        response.raise_for_status()
+        return response.json()
+
+    def location_key(self, lat, lon):
+        """Return the AccuWeather location key for a position, searching only for unindexed areas"""
+        return self.location_index.get_or_lookup(lat, lon, self.search_location_key)
+
+    def search_location_key(self, lat, lon):
+        """Look up the location key of a position with the geoposition search API"""
+        return self._get("/locations/v1/cities/geoposition/search", q=f"{lat},{lon}")["Key"]
+
+    def conditions(self, location_key):
+        """Return temperature, humidity and rainfall for an AccuWeather location key"""
+        current_data = self._get(f"/currentconditions/v1/{location_key}", details="true")[0]
+        forecast_data = self._get(f"/forecasts/v1/daily/1day/{location_key}", details="true", metric="true")
+
+        return {
+            "temperature": current_data["Temperature"]["Metric"]["Value"],
+            "humidity": current_data["RelativeHumidity"],
+            "rainfall": forecast_data["DailyForecasts"][0]["Day"]["RainValue"]
+        }
+
+    def fetch(self, lat, lon):
+        return self.conditions(self.location_key(lat, lon))
+
+
+class StubWeatherProvider(WeatherProvider):
+    """
+    Returns a fixed reading and counts upstream calls, without network access
+
+    The reading has the keys of both real providers, so it can stand in for
+    either.
+    """
+
+    name = "stub"
+
+    DEFAULT_READING = {
+        "temperature": 25.0,
+        "humidity": 60.0,
+        "precipitation": 0.0,
+        "rainfall": 5.0,
+        "wind_speed": 5.0,
+        "conditions": "Clear",
+        "description": "clear sky (stub provider)"
+    }
+
+    def __init__(self, reading=None, delay=0.0):
+        self.reading = dict(reading or self.DEFAULT_READING)
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch(self, lat, lon):
+        with self._lock:
+            self.calls.append((lat, lon))
+        if self.delay:
+            time.sleep(self.delay)
+        return dict(self.reading)
+
+
+class WeatherCache:
+    """
+    TTL cache of one provider's readings on a lat/lon grid, shared through Redis
+
+    Args:
+        provider: WeatherProvider to fetch from on a miss
+        ttl: Seconds a reading stays valid
+        bucket_degrees: Grid cell size in degrees
+        redis_client: Redis client, created from REDIS_URL by default
+    """
+
+    def __init__(self, provider, ttl=WEATHER_CACHE_TTL, bucket_degrees=WEATHER_BUCKET_DEGREES,
+                 redis_client=None):
+        self.provider = provider
+        self.ttl = ttl
+        self.bucket_degrees = bucket_degrees
+        self._redis = redis_client
+        self._redis_retry_at = 0.0
+        self._memory = {}
+        self._key_locks = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        return self._redis
+
+    def _call(self, command, *args, **kwargs):
+        """Run a Redis command, raising redis.RedisError while Redis is unavailable"""
+        if time.monotonic() < self._redis_retry_at:
+            raise redis.ConnectionError("Redis unavailable")
+        try:
+            return getattr(self.redis, command)(*args, **kwargs)
+        except redis.RedisError as e:
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+            logger.warning(f"Weather cache unavailable, using process memory: {str(e)}")
+            raise
+
+    def bucket(self, lat, lon):
+        """Return the (row, col) grid cell of a position"""
+        return round(lat / self.bucket_degrees), round(lon / self.bucket_degrees)
+
+    def bucket_center(self, lat, lon):
+        """Return the position weather is fetched at for every field in the cell"""
+        row, col = self.bucket(lat, lon)
+        return round(row * self.bucket_degrees, 6), round(col * self.bucket_degrees, 6)
+
+    def key_for(self, lat, lon):
+        row, col = self.bucket(lat, lon)
+        return f"weather:{self.provider.name}:{self.bucket_degrees}:{row}:{col}"
+
+    def get(self, lat, lon):
+        """
+        Return the reading for a position, fetching it on a cache miss
+
+        Raises:
+            Exception: Whatever the provider raised if the fetch failed
+        """
+        key = self.key_for(float(lat), float(lon))
+        reading = self._read(key)
+        if reading is not None:
+            return reading
+
+        # Threads of this process wait here while one of them fetches
+        with self._key_lock(key):
+            reading = self._read(key)
+            if reading is not None:
+                return reading
+
+            token = self._acquire(key)
+            if token is None:
+                # Another worker is fetching this bucket
+                reading = self._wait(key)
+                if reading is not None:
+                    return reading
+                logger.warning(f"Timed out waiting for {key}, fetching it directly")
+
+            try:
+                reading = self.provider.fetch(*self.bucket_center(lat, lon))
+                self._write(key, reading)
+            finally:
+                if token is not None:
+                    self._release(key, token)
+
+            logger.info(f"Fetched weather for {key}")
+            return reading
+
+    def _key_lock(self, key):
+        with self._locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _read(self, key):
+        try:
+            value = self._call("get", key)
+            return json.loads(value) if value is not None else None
+        except redis.RedisError:
+            pass
+
+        expires, reading = self._memory.get(key, (0, None))
+        return reading if expires > time.monotonic() else None
+
+    def _write(self, key, reading):
+        try:
+            self._call("set", key, json.dumps(reading), ex=self.ttl)
+        except redis.RedisError:
+            self._memory[key] = (time.monotonic() + self.ttl, reading)
+
+    def _acquire(self, key):
+        """Take the bucket's fetch lock; returns a release token, or None if another worker holds it"""
+        token = uuid.uuid4().hex
+        try:
+            if self._call("set", f"{key}:lock", token, nx=True, ex=LOCK_TIMEOUT):
+                return token
+            return None
+        except redis.RedisError:
+            # Without Redis, coalescing is limited to this process
+            return token
+
+    def _release(self, key, token):
+        try:
+            lock_key = f"{key}:lock"
+            if self._call("get", lock_key) == token.encode():
+                self._call("delete", lock_key)
+        except redis.RedisError:
+            pass
+
+    def _wait(self, key, poll_interval=0.1):
+        """Poll for the reading another worker is fetching until its lock expires"""
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            reading = self._read(key)
+            if reading is not None:
+                return reading
+            try:
+                if not self._call("exists", f"{key}:lock"):
+                    # The fetch failed; check once more, then fetch ourselves
+                    return self._read(key)
+            except redis.RedisError:
+                return None
+        return None
+
+
+PROVIDERS = {
+    "openweather": OpenWeatherProvider,
+    "accuweather": AccuWeatherProvider,
+    "stub": StubWeatherProvider,
+}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_weather_cache(provider_name):
+    """Return the process-wide WeatherCache for a provider"""
+    with _caches_lock:
+        cache = _caches.get(provider_name)
+        if cache is None:
+            provider = PROVIDERS[WEATHER_PROVIDER or provider_name]()
+            cache = _caches[provider_name] = WeatherCache(provider)
+        return cache
+
+
+def set_weather_provider(provider_name, provider, **cache_options):
+    """
+    Replace the provider used for provider_name, e.g. with a StubWeatherProvider in tests
+
+    Returns:
+        WeatherCache: The new cache; cache_options are passed to WeatherCache
+    """
+    with _caches_lock:
+        cache = _caches[provider_name] = WeatherCache(provider, **cache_options)
+        return cache
+
+
+def get_weather(provider_name, lat, lon):
+    """Return the cached or freshly fetched reading of a provider for a position"""
+    return get_weather_cache(provider_name).get(lat, lon)
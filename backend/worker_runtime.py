@@ -0,0 +1,142 @@
+"""
+Per-process asyncio runtime for Celery workers
+
+Celery task bodies are synchronous, but the database layer (Motor) is
+asyncio. Creating a loop per task forces Motor to reconnect every time, and
+a Motor client created in one loop fails with "attached to a different
+loop" when used from another.
+
+Each worker process therefore owns one event loop, running in a daemon
+thread, and one Motor client bound to it. Prefork children create theirs on
+worker_process_init and close it on worker_process_shutdown, which Celery
+sends only for forked pool processes. Workers that run tasks in the main
+process (threads, solo) create it on worker_init and close it on
+worker_shutdown instead. Task bodies hand their coroutines to run_async,
+which runs them on that loop. Concurrent tasks in a thread-pool worker share
+the loop and the connection pool.
+
+Outside a worker (scripts, eager tasks) the runtime starts on first use.
+"""
+import os
+import asyncio
+import logging
+import threading
+from celery.concurrency import get_implementation
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import MONGODB_URI, DATABASE_NAME
+
+logger = logging.getLogger('worker_runtime')
+
+# Seconds to wait for pending work when the worker shuts down
+SHUTDOWN_TIMEOUT = 10
+
+
+class WorkerRuntime:
+    """
+    An event loop in a background thread plus the Motor client bound to it
+    """
+
+    def __init__(self, mongodb_uri=MONGODB_URI, database_name=DATABASE_NAME):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="worker-event-loop", daemon=True)
+        self._thread.start()
+
+        # Motor picks up the running loop, so the client is created on it
+        self.client = self.call(self._create_client, mongodb_uri)
+        self.db = self.client[database_name]
+
+    @staticmethod
+    async def _create_client(mongodb_uri):
+        return AsyncIOMotorClient(mongodb_uri)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call(self, coro_fn, *args):
+        """Run coro_fn(*args) on the runtime's loop and return its result"""
+        return asyncio.run_coroutine_threadsafe(coro_fn(*args), self.loop).result()
+
+    def run(self, coro):
+        """
+        Run a coroutine on the runtime's loop, blocking until it finishes
+
+        Raises:
+            RuntimeError: If called from the runtime's own loop, which would deadlock
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run() cannot be called from the worker event loop; await instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        """Close the Motor client and stop the loop"""
+        if self.loop.is_closed():
+            return
+        try:
+            self.client.close()
+            future = asyncio.run_coroutine_threadsafe(self.loop.shutdown_asyncgens(), self.loop)
+            future.result(timeout=SHUTDOWN_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error while closing worker runtime: {str(e)}")
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=SHUTDOWN_TIMEOUT)
+            if not self._thread.is_alive():
+                self.loop.close()
+
+
+_runtime = None
+_lock = threading.Lock()
+
+
+def get_runtime():
+    """Return this process's WorkerRuntime, starting one if needed"""
+    global _runtime
+    with _lock:
+        # A runtime inherited through fork has no loop thread in this process
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = WorkerRuntime()
+            logger.info(f"Started worker runtime in process {_runtime.pid}")
+        return _runtime
+
+
+def run_async(coro):
+    """Run a task body's coroutine on this process's worker loop"""
+    return get_runtime().run(coro)
+
+
+def get_collection(name):
+    """Return a Motor collection of the worker's client, for use inside run_async"""
+    return get_runtime().db[name]
+
+
+def init_worker_runtime(**kwargs):
+    """Start the loop and Motor client of this process; connected to worker_process_init"""
+    get_runtime()
+
+
+def _forks_pool_processes(worker):
+    return get_implementation(worker.pool_cls).__module__ == "celery.concurrency.prefork"
+
+
+def init_main_runtime(sender=None, **kwargs):
+    """
+    Start the runtime of a worker that runs tasks in its main process; connected to worker_init
+
+    Prefork workers are skipped: their children start their own runtime, and
+    a Motor client must not be created before forking.
+    """
+    if sender is not None and not _forks_pool_processes(sender):
+        get_runtime()
+
+
+def shutdown_worker_runtime(**kwargs):
+    """Close the loop and Motor client of this process; connected to worker_process_shutdown and worker_shutdown"""
+    global _runtime
+    with _lock:
+        if _runtime is not None and _runtime.pid == os.getpid():
+            _runtime.close()
+            logger.info(f"Closed worker runtime in process {_runtime.pid}")
+        _runtime = None